@@ -6,19 +6,65 @@ from flask import send_from_directory
 from flask_cors import CORS
 
 # Local imports
+from models.produto import get_connection, init_schema
+from models.write_queue import start_write_coordinator, stop_write_coordinator
+from models.maintenance import start_maintenance_scheduler, stop_maintenance_scheduler
 from routes.lojas import lojas_bp
 from routes.compras import compras_bp
 from routes.logistica import logistica_bp
+from routes.admin import admin_bp
+from utils.profiling import init_profiling
 
 
-def create_app() -> Flask:
+def start_background_services(write_queue: bool = True, maintenance: bool = True) -> None:
+    # Optional single-writer mode: HORTI_WRITE_QUEUE=1 groups concurrent writes into
+    # shared transactions (commit latency bounded by HORTI_WRITE_LATENCY_MS; callers
+    # give up after HORTI_WRITE_TIMEOUT seconds)
+    if write_queue and os.environ.get("HORTI_WRITE_QUEUE") == "1":
+        start_write_coordinator(
+            get_connection,
+            max_batch=int(os.environ.get("HORTI_WRITE_BATCH", "64")),
+            max_latency=float(os.environ.get("HORTI_WRITE_LATENCY_MS", "5")) / 1000.0,
+            timeout=float(os.environ.get("HORTI_WRITE_TIMEOUT", "30")),
+        )
+
+    # Optional background maintenance every HORTI_MAINTENANCE_INTERVAL seconds,
+    # archiving rows older than HORTI_ARCHIVE_DAYS when set
+    if maintenance and os.environ.get("HORTI_MAINTENANCE_INTERVAL"):
+        archive_days = os.environ.get("HORTI_ARCHIVE_DAYS")
+        start_maintenance_scheduler(
+            float(os.environ["HORTI_MAINTENANCE_INTERVAL"]),
+            int(archive_days) if archive_days else None,
+        )
+
+
+def stop_background_services() -> None:
+    # Flush queued writes and stop the scheduler
+    stop_write_coordinator()
+    stop_maintenance_scheduler()
+
+
+def create_app(start_services: bool = True) -> Flask:
     app = Flask(__name__)
     CORS(app)
 
+    # Create/migrate tables (e.g. the demand_daily rollup) before the first request;
+    # idempotent, so every worker can run it
+    init_schema()
+
+    # Pre-forking servers pass start_services=False and start them per worker,
+    # since threads do not survive fork()
+    if start_services:
+        start_background_services()
+
     # Blueprints
     app.register_blueprint(lojas_bp, url_prefix="/api/lojas")
     app.register_blueprint(compras_bp, url_prefix="/api/compras")
     app.register_blueprint(logistica_bp, url_prefix="/api/logistica")
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
+
+    # Opt-in cProfile + SQL capture (X-Profile: 1 or the /api/admin/profiling toggle)
+    init_profiling(app)
 
     @app.route("/api/health", methods=["GET"])  # simple readiness probe
     def health() -> tuple:
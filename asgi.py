@@ -0,0 +1,326 @@
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import start_background_services, stop_background_services
+from models import async_db
+from models.async_db import open_stream, run_cpu, run_db
+from models.produto import (
+    init_schema,
+    initialize_database,
+    iter_products,
+    create_order,
+    iter_orders,
+    list_order_items,
+    iter_store_order_totals,
+    assign_supplier,
+    bulk_assign_suppliers,
+    list_assignments,
+    iter_consolidated_by_supplier,
+    iter_consolidate_purchases,
+    consolidate_purchases,
+    create_supplier_logistics_plans,
+    reconciliation_report,
+    demand_history,
+    iter_logistics,
+    update_received,
+    save_distribution,
+    store_totals,
+    list_logistics_suppliers,
+    supplier_plan,
+)
+from utils.allocation import allocate_received
+from utils.demand_forecast import suggest_quantities
+from utils.export_excel import export_store_excel, export_reconciliation_excel
+from utils.export_txt import export_store_txt
+from utils.export_word import export_consolidated_word
+from utils.streaming import encode_rows, prime_rows
+
+
+# Same /api/lojas, /api/compras and /api/logistica endpoints as the Flask blueprints,
+# served on an ASGI stack: run with `uvicorn asgi:app --workers N`.
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _dumps(row: Any) -> str:
+    return json.dumps(row, sort_keys=True)
+
+
+def _archive(request: Request) -> bool:
+    return request.query_params.get("archive") == "1"
+
+
+async def _body(request: Request) -> Dict[str, Any]:
+    raw = await request.body()
+    return json.loads(raw) if raw else {}
+
+
+async def _stream(request: Request, factory: Callable[..., Iterator[Dict[str, Any]]], *args: Any) -> StreamingResponse:
+    # the cursor is opened, primed and read on one stream-pool thread, a chunk at a time;
+    # errors while running the query raise here, before the response starts
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    chunks = await open_stream(lambda: encode_rows(prime_rows(factory(*args)), ndjson, _dumps))
+    return StreamingResponse(chunks, media_type="application/x-ndjson" if ndjson else "application/json")
+
+
+def _download(content: bytes, media_type: str, filename: str) -> Response:
+    return Response(content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+def _consolidated_rows(consolidated: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {"code": r["code"], "name": r["name"], "quantity": r["total_quantity"], "unit": r["unit"]}
+        for r in consolidated
+    ]
+
+
+# lojas
+
+async def init(request: Request) -> Response:
+    data = await _body(request)
+    imported = await run_db(initialize_database, data.get("excel_path"))
+    return JSONResponse({"ok": True, "imported": imported})
+
+
+async def produtos(request: Request) -> Response:
+    return await _stream(request, iter_products, request.query_params.get("q"))
+
+
+async def pedido(request: Request) -> Response:
+    data = await _body(request)
+    order_id = await run_db(create_order, data.get("store_code"), None, data.get("items", []))
+    return JSONResponse({"order_id": order_id}, status_code=201)
+
+
+# compras
+
+async def pedidos(request: Request) -> Response:
+    return await _stream(request, iter_orders, request.query_params.get("store"), None, _archive(request))
+
+
+async def pedido_detail(request: Request) -> Response:
+    rows = await run_db(list_order_items, request.path_params["order_id"], _archive(request))
+    return JSONResponse(rows)
+
+
+async def store_totais(request: Request) -> Response:
+    return await _stream(request, iter_store_order_totals, request.path_params["store_code"], _archive(request))
+
+
+async def set_assign(request: Request) -> Response:
+    data = await _body(request)
+    await run_db(assign_supplier, data.get("store_code"), data.get("product_code"), data.get("supplier"))
+    return JSONResponse({"ok": True})
+
+
+async def set_assign_bulk(request: Request) -> Response:
+    data = await _body(request)
+    try:
+        diff = await run_db(
+            bulk_assign_suppliers,
+            data.get("assignments", []),
+            data.get("rules", []),
+            bool(data.get("copy_forward")),
+            bool(data.get("replace")),
+            bool(data.get("dry_run")),
+        )
+    except (ValueError, KeyError) as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    return JSONResponse(diff)
+
+
+async def get_assignments(request: Request) -> Response:
+    return JSONResponse(await run_db(list_assignments, request.path_params["store_code"]))
+
+
+async def rel_consolidado_fornecedor(request: Request) -> Response:
+    return await _stream(request, iter_consolidated_by_supplier, _archive(request))
+
+
+async def rel_consolidado(request: Request) -> Response:
+    return await _stream(request, iter_consolidate_purchases, _archive(request))
+
+
+async def rel_conciliacao(request: Request) -> Response:
+    rows = await run_db(reconciliation_report, request.query_params.get("supplier"), _archive(request))
+    return JSONResponse(rows)
+
+
+async def historico(request: Request) -> Response:
+    q = request.query_params
+    try:
+        rows = await run_db(
+            demand_history, q.get("store"), q.get("product"), q.get("granularity", "day"), int(q.get("days", 56))
+        )
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    return JSONResponse(rows)
+
+
+async def sugestao(request: Request) -> Response:
+    q = request.query_params
+    try:
+        rows = await run_db(
+            suggest_quantities,
+            q.get("date"),
+            int(q.get("days", 56)),
+            int(q.get("window", 14)),
+            int(q.get("horizon", 1)),
+            q.get("store"),
+        )
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    return JSONResponse(rows)
+
+
+async def enviar_logistica(request: Request) -> Response:
+    data = await _body(request)
+    result = await run_db(create_supplier_logistics_plans, data.get("supplier"))
+    return JSONResponse({"ok": True, **result})
+
+
+async def export_excel(request: Request) -> Response:
+    rows = _consolidated_rows(await run_db(consolidate_purchases, _archive(request)))
+    return _download(await run_cpu(export_store_excel, rows, "Consolidado"), XLSX, "consolidado.xlsx")
+
+
+async def export_word(request: Request) -> Response:
+    rows = _consolidated_rows(await run_db(consolidate_purchases, _archive(request)))
+    content = await run_cpu(export_consolidated_word, rows, "Relatório Consolidado")
+    return _download(content, DOCX, "consolidado.docx")
+
+
+async def export_conciliacao_excel(request: Request) -> Response:
+    items = await run_db(reconciliation_report, request.query_params.get("supplier"), _archive(request))
+    return _download(await run_cpu(export_reconciliation_excel, items), XLSX, "conciliacao.xlsx")
+
+
+# logistica
+
+async def itens(request: Request) -> Response:
+    q = request.query_params
+    return await _stream(request, iter_logistics, q.get("supplier"), q.get("q"), _archive(request))
+
+
+async def recebimento(request: Request) -> Response:
+    data = await _body(request)
+    await run_db(update_received, request.path_params["plan_id"], float(data.get("received_quantity", 0)))
+    return JSONResponse({"ok": True})
+
+
+async def export_store_excel_route(request: Request) -> Response:
+    store_code = request.path_params["store_code"]
+    rows = await run_db(store_totals, store_code, _archive(request))
+    content = await run_cpu(export_store_excel, rows, store_code)
+    return _download(content, XLSX, f"{store_code.lower()}_pedido.xlsx")
+
+
+async def export_store_txt_route(request: Request) -> Response:
+    store_code = request.path_params["store_code"]
+    rows = await run_db(store_totals, store_code, _archive(request))
+    content = export_store_txt(rows)
+    return _download(content, "text/plain; charset=utf-8", f"{store_code.lower()}_vr_master.txt")
+
+
+async def fornecedores(request: Request) -> Response:
+    return JSONResponse(await run_db(list_logistics_suppliers))
+
+
+async def plano_fornecedor(request: Request) -> Response:
+    items = await run_db(supplier_plan, request.query_params.get("supplier"), request.query_params.get("q"))
+    return JSONResponse(items)
+
+
+async def distribuir(request: Request) -> Response:
+    data = await _body(request)
+    await run_db(save_distribution, request.path_params["plan_id"], data.get("distribution", []))
+    return JSONResponse({"ok": True})
+
+
+async def distribuir_auto(request: Request) -> Response:
+    data = await _body(request)
+    dry_run = bool(data.get("dry_run")) or request.query_params.get("dry_run") == "1"
+    try:
+        result = await run_db(
+            allocate_received,
+            data.get("mode", "proportional"),
+            data.get("priority"),
+            data.get("plan_ids"),
+            dry_run,
+            bool(data.get("overwrite")),
+        )
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    return JSONResponse(result)
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok"})
+
+
+routes = [
+    Route("/api/health", health, methods=["GET"]),
+    Mount("/api/lojas", routes=[
+        Route("/init", init, methods=["POST"]),
+        Route("/produtos", produtos, methods=["GET"]),
+        Route("/pedido", pedido, methods=["POST"]),
+    ]),
+    Mount("/api/compras", routes=[
+        Route("/pedidos", pedidos, methods=["GET"]),
+        Route("/pedido/{order_id:int}", pedido_detail, methods=["GET"]),
+        Route("/store/{store_code}/totais", store_totais, methods=["GET"]),
+        Route("/assign", set_assign, methods=["POST"]),
+        Route("/assign/bulk", set_assign_bulk, methods=["POST"]),
+        Route("/store/{store_code}/assignments", get_assignments, methods=["GET"]),
+        Route("/relatorio/consolidado-fornecedor", rel_consolidado_fornecedor, methods=["GET"]),
+        Route("/relatorio/consolidado", rel_consolidado, methods=["GET"]),
+        Route("/relatorio/conciliacao", rel_conciliacao, methods=["GET"]),
+        Route("/historico", historico, methods=["GET"]),
+        Route("/sugestao", sugestao, methods=["GET"]),
+        Route("/enviar-logistica", enviar_logistica, methods=["POST"]),
+        Route("/export/excel", export_excel, methods=["GET"]),
+        Route("/export/word", export_word, methods=["GET"]),
+        Route("/export/conciliacao/excel", export_conciliacao_excel, methods=["GET"]),
+    ]),
+    Mount("/api/logistica", routes=[
+        Route("/itens", itens, methods=["GET"]),
+        Route("/recebimento/{plan_id:int}", recebimento, methods=["PUT"]),
+        Route("/export/store/{store_code}/excel", export_store_excel_route, methods=["GET"]),
+        Route("/export/store/{store_code}/txt", export_store_txt_route, methods=["GET"]),
+        Route("/fornecedores", fornecedores, methods=["GET"]),
+        Route("/plano-fornecedor", plano_fornecedor, methods=["GET"]),
+        Route("/distribuir/{plan_id:int}", distribuir, methods=["POST"]),
+        Route("/distribuir-auto", distribuir_auto, methods=["POST"]),
+    ]),
+]
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncIterator[None]:
+    # every uvicorn worker runs this; maintenance only starts where HORTI_ASGI_MAINTENANCE=1
+    # (a single worker), otherwise run it from cron with `python -m models.maintenance`
+    # tables/migrations first (idempotent), as create_app does for the WSGI servers
+    init_schema()
+    start_background_services(maintenance=os.environ.get("HORTI_ASGI_MAINTENANCE") == "1")
+    try:
+        yield
+    finally:
+        stop_background_services()
+        async_db.shutdown()
+
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,140 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+
+# Async facade over the synchronous model layer: blocking sqlite calls run on a dedicated
+# DB thread pool (HORTI_DB_THREADS), streamed cursors on a bounded stream pool
+# (HORTI_STREAM_THREADS) and CPU-heavy exports on a process pool (HORTI_CPU_WORKERS),
+# so the event loop never blocks.
+_db_pool: Optional[ThreadPoolExecutor] = None
+_stream_pool: Optional[ThreadPoolExecutor] = None
+_cpu_pool: Optional[Executor] = None
+
+_CHUNK, _DONE, _ERROR = range(3)
+
+
+def _get_db_pool() -> ThreadPoolExecutor:
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("HORTI_DB_THREADS", "8")),
+            thread_name_prefix="horti-db",
+        )
+    return _db_pool
+
+
+def _get_stream_pool() -> ThreadPoolExecutor:
+    global _stream_pool
+    if _stream_pool is None:
+        _stream_pool = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("HORTI_STREAM_THREADS", "8")),
+            thread_name_prefix="horti-stream",
+        )
+    return _stream_pool
+
+
+def _get_cpu_pool() -> Executor:
+    global _cpu_pool
+    if _cpu_pool is None:
+        # created lazily while the writer and pool threads already run, so workers are
+        # spawned rather than forked from a process holding live threads and locks
+        _cpu_pool = ProcessPoolExecutor(
+            max_workers=int(os.environ.get("HORTI_CPU_WORKERS", "2")),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _cpu_pool
+
+
+async def run_db(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_pool(), partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    # fn and its arguments must be picklable (module-level export functions and plain rows)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_cpu_pool(), partial(fn, *args))
+
+
+async def open_stream(make_chunks: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    # Drive a cursor-backed generator from async code. sqlite connections are bound to the
+    # thread that opened them, so one stream-pool thread builds the iterator, reads it to the
+    # end and closes it, handing chunks over through a small queue (backpressure). At most
+    # HORTI_STREAM_THREADS streams read at once; later ones wait for a free thread.
+    # Returns once the first item (or the error raised while opening) is available, so
+    # query failures surface before the response starts.
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=4)
+    gone = threading.Event()
+
+    def put(kind: int, value: Any = None) -> bool:
+        # runs on the stream thread; False once the consumer has gone away (or has not
+        # taken anything for a minute, e.g. a response that was never started)
+        deadline = time.monotonic() + 60
+        while not gone.is_set() and time.monotonic() < deadline:
+            future = asyncio.run_coroutine_threadsafe(queue.put((kind, value)), loop)
+            try:
+                future.result(0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if not future.cancel():
+                    return True
+            except RuntimeError:
+                # event loop closed
+                return False
+        return False
+
+    def produce() -> None:
+        try:
+            chunks = make_chunks()
+        except BaseException as exc:
+            put(_ERROR, exc)
+            return
+        try:
+            for chunk in chunks:
+                if not put(_CHUNK, chunk):
+                    return
+            put(_DONE)
+        except BaseException as exc:
+            put(_ERROR, exc)
+        finally:
+            getattr(chunks, "close", lambda: None)()
+
+    loop.run_in_executor(_get_stream_pool(), produce)
+    first = await queue.get()
+    if first[0] == _ERROR:
+        gone.set()
+        raise first[1]
+
+    async def consume() -> AsyncIterator[Any]:
+        kind, value = first
+        try:
+            while kind == _CHUNK:
+                yield value
+                kind, value = await queue.get()
+            if kind == _ERROR:
+                raise value
+        finally:
+            gone.set()
+
+    return consume()
+
+
+def shutdown() -> None:
+    global _db_pool, _stream_pool, _cpu_pool
+    if _db_pool is not None:
+        _db_pool.shutdown()
+        _db_pool = None
+    if _stream_pool is not None:
+        _stream_pool.shutdown()
+        _stream_pool = None
+    if _cpu_pool is not None:
+        _cpu_pool.shutdown()
+        _cpu_pool = None
@@ -0,0 +1,223 @@
+import argparse
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from models import produto
+
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per backup step and pause between steps; the pause is what lets
+# writers in other workers commit while a snapshot is being taken
+BACKUP_PAGES = int(os.environ.get("HORTI_BACKUP_PAGES", "256"))
+BACKUP_PAUSE = float(os.environ.get("HORTI_BACKUP_PAUSE_MS", "5")) / 1000.0
+BACKUP_KEEP = int(os.environ.get("HORTI_BACKUP_KEEP", "7"))
+
+
+def backup_dir() -> str:
+    return os.path.join(os.path.dirname(produto.DB_PATH), "backups")
+
+
+def _database_files() -> List[Tuple[str, str]]:
+    # (name inside the snapshot, live path) for main, archive and every store shard
+    files = [("horti.db", produto.DB_PATH)]
+    if os.path.exists(produto.ARCHIVE_PATH):
+        files.append(("horti_archive.db", produto.ARCHIVE_PATH))
+    for _, path in produto.shard_paths():
+        files.append((os.path.join("shards", os.path.basename(path)), path))
+    return files
+
+
+def _copy_online(src_path: str, dest_path: str, pages: int, pause: float) -> Dict[str, Any]:
+    steps = 0
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        nonlocal steps
+        steps += 1
+        if remaining and pause:
+            time.sleep(pause)
+
+    src = sqlite3.connect(src_path, isolation_level=None)
+    dest = sqlite3.connect(dest_path)
+    try:
+        # In WAL mode one read snapshot is pinned for the whole copy: writers keep committing
+        # and the backup never restarts. In rollback-journal mode a read transaction would
+        # block writers, so each step takes and releases its own shared lock instead (the
+        # copy restarts if another connection writes in between).
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        if wal:
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        src.backup(dest, pages=pages, progress=progress)
+        if wal:
+            src.execute("COMMIT")
+        integrity = dest.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        dest.close()
+        src.close()
+    return {"steps": steps, "integrity": integrity}
+
+
+def _gzip(path: str) -> str:
+    with open(path, "rb") as raw, gzip.open(path + ".gz", "wb", compresslevel=6) as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+    os.remove(path)
+    return path + ".gz"
+
+
+def create_backup(pages: int = BACKUP_PAGES, pause: float = BACKUP_PAUSE, keep: int = BACKUP_KEEP) -> Dict[str, Any]:
+    # Snapshot every database file with the online backup API, verify each copy with
+    # PRAGMA integrity_check, gzip it and record a manifest; a failed check aborts the
+    # snapshot so only verified ones are ever kept
+    started = time.perf_counter()
+    # microseconds keep ids unique (and sortable) for snapshots taken in the same second;
+    # the exclusive mkdir refuses to share a directory with a concurrent run regardless
+    snapshot_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    target = os.path.join(backup_dir(), snapshot_id)
+    partial = target + ".partial"
+    if os.path.exists(target):
+        raise RuntimeError(f"backup already exists: {snapshot_id}")
+    os.makedirs(backup_dir(), exist_ok=True)
+    os.mkdir(partial)
+    os.mkdir(os.path.join(partial, "shards"))
+
+    files: List[Dict[str, Any]] = []
+    try:
+        for name, path in _database_files():
+            file_started = time.perf_counter()
+            dest = os.path.join(partial, name)
+            copy = _copy_online(path, dest, pages, pause)
+            if copy["integrity"] != "ok":
+                raise RuntimeError(f"integrity check failed for {name}: {copy['integrity']}")
+            size = os.path.getsize(dest)
+            packed = _gzip(dest)
+            files.append({
+                "name": name,
+                "size_bytes": size,
+                "compressed_bytes": os.path.getsize(packed),
+                "steps": copy["steps"],
+                "duration_ms": round((time.perf_counter() - file_started) * 1000, 3),
+            })
+    except Exception:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    manifest = {
+        "id": snapshot_id,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "size_bytes": sum(f["size_bytes"] for f in files),
+        "compressed_bytes": sum(f["compressed_bytes"] for f in files),
+        "files": files,
+    }
+    with open(os.path.join(partial, "manifest.json"), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(partial, target)
+    manifest["removed"] = rotate_backups(keep)
+    logger.info(
+        "backup %s: %d files, %d bytes (%d compressed) in %.1f ms",
+        snapshot_id, len(files), manifest["size_bytes"], manifest["compressed_bytes"], manifest["duration_ms"],
+    )
+    return manifest
+
+
+def list_backups() -> List[Dict[str, Any]]:
+    directory = backup_dir()
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, name, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                manifests.append(json.load(fh))
+    return manifests
+
+
+def rotate_backups(keep: int = BACKUP_KEEP) -> List[str]:
+    removed = [m["id"] for m in list_backups()[max(keep, 1):]]
+    for snapshot_id in removed:
+        shutil.rmtree(os.path.join(backup_dir(), snapshot_id), ignore_errors=True)
+    return removed
+
+
+def restore_backup(snapshot_id: Optional[str] = None) -> Dict[str, Any]:
+    # Offline restore: stop every worker first. Each file is unpacked next to its live
+    # path, verified, then swapped in; stale -wal/-shm files are removed so SQLite does
+    # not replay them over the restored pages. Live archive/shard files the snapshot does
+    # not have are moved aside (renamed with a ".before-<id>" suffix) so the union views
+    # only see the restored point in time.
+    manifests = list_backups()
+    if snapshot_id is not None:
+        manifests = [m for m in manifests if m["id"] == snapshot_id]
+    if not manifests:
+        raise ValueError(f"backup not found: {snapshot_id or '(latest)'}")
+    manifest = manifests[0]
+    source = os.path.join(backup_dir(), manifest["id"])
+
+    live = dict(_database_files())
+    restored = []
+    for entry in manifest["files"]:
+        name = entry["name"]
+        path = live.get(name)
+        if path is None:
+            # archive or shard files that no longer exist are recreated in place
+            base = produto.shard_dir() if name.startswith("shards") else os.path.dirname(produto.DB_PATH)
+            path = os.path.join(base, os.path.basename(name))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        staging = path + ".restore"
+        with gzip.open(os.path.join(source, name + ".gz"), "rb") as packed, open(staging, "wb") as raw:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+        conn = sqlite3.connect(staging)
+        try:
+            integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if integrity != "ok":
+            os.remove(staging)
+            raise RuntimeError(f"integrity check failed for {name}: {integrity}")
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.replace(staging, path)
+        restored.append(name)
+
+    moved_aside = []
+    for name, path in live.items():
+        if name in restored:
+            continue
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.replace(path + suffix, f"{path}.before-{manifest['id']}{suffix}")
+        moved_aside.append(name)
+    return {"id": manifest["id"], "restored": restored, "moved_aside": moved_aside}
+
+
+def main() -> Any:
+    parser = argparse.ArgumentParser(description="Online snapshots of the Horti databases")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="take a compressed, verified snapshot")
+    create.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages copied per step")
+    create.add_argument("--pause-ms", type=float, default=BACKUP_PAUSE * 1000, help="pause between steps")
+    create.add_argument("--keep", type=int, default=BACKUP_KEEP, help="snapshots to keep after rotation")
+    sub.add_parser("list", help="list snapshots, newest first")
+    restore = sub.add_parser("restore", help="restore a snapshot (stop the app first)")
+    restore.add_argument("snapshot", nargs="?", default=None, help="snapshot id (default: latest)")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        return create_backup(args.pages, args.pause_ms / 1000.0, args.keep)
+    if args.command == "list":
+        return list_backups()
+    return restore_backup(args.snapshot)
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(), indent=2))
@@ -0,0 +1,182 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from models.produto import ARCHIVED_TABLES, TABLE_COLUMNS, TABLE_DDL, get_connection
+from models import produto
+
+
+logger = logging.getLogger(__name__)
+
+
+# Row selection per table; orders/plans are archived by age and their children follow them
+_ARCHIVE_WHERE = {
+    "orders": "id IN (SELECT id FROM temp.archive_orders)",
+    "order_items": "order_id IN (SELECT id FROM temp.archive_orders)",
+    "logistics_plan": "id IN (SELECT id FROM temp.archive_plans)",
+    "logistics_received": "logistics_plan_id IN (SELECT id FROM temp.archive_plans)",
+    "logistics_distribution": "logistics_plan_id IN (SELECT id FROM temp.archive_plans)",
+}
+
+
+def _ensure_archive_tables(tables: Tuple[str, ...]) -> None:
+    # Archive tables use the live DDL (keys, UNIQUE constraints, indexes). Tables from
+    # older archives, copied without any key, are rebuilt once with their rows kept.
+    conn = sqlite3.connect(produto.ARCHIVE_PATH)
+    try:
+        # WAL like the hot files, so archive=1 streams do not block the next run
+        conn.execute("PRAGMA journal_mode=WAL")
+        for table in tables:
+            info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+            if info and not any(col[5] for col in info):
+                columns = TABLE_COLUMNS[table]
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                for statement in TABLE_DDL[table]:
+                    conn.execute(statement)
+                conn.execute(f"INSERT OR IGNORE INTO {table}({columns}) SELECT {columns} FROM {table}_legacy")
+                conn.execute(f"DROP TABLE {table}_legacy")
+            else:
+                for statement in TABLE_DDL[table]:
+                    conn.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _archive_file(conn: sqlite3.Connection, tables: Tuple[str, ...], cutoff: str) -> Dict[str, int]:
+    moved: Dict[str, int] = {}
+    _ensure_archive_tables(tables)
+    conn.execute("ATTACH DATABASE ? AS archive", (produto.ARCHIVE_PATH,))
+    conn.execute("CREATE TEMP TABLE archive_orders AS SELECT id FROM main.orders WHERE created_at < datetime('now', ?)", (cutoff,))
+    if "logistics_plan" in tables:
+        conn.execute(
+            "CREATE TEMP TABLE archive_plans AS SELECT id FROM main.logistics_plan WHERE created_at < datetime('now', ?)",
+            (cutoff,),
+        )
+    for table in tables:
+        columns = TABLE_COLUMNS[table]
+        conn.execute(
+            f"INSERT OR IGNORE INTO archive.{table}({columns}) "
+            f"SELECT {columns} FROM main.{table} WHERE {_ARCHIVE_WHERE[table]}"
+        )
+    # children first on delete so foreign keys never point at missing parents
+    for table in reversed(tables):
+        moved[table] = conn.execute(f"DELETE FROM main.{table} WHERE {_ARCHIVE_WHERE[table]}").rowcount
+    conn.commit()
+    return moved
+
+
+def archive_old_rows(days: int = 90) -> Dict[str, int]:
+    # Move orders and logistics plans older than `days` (with their items, received and
+    # distribution rows) into the archive database, one transaction per database file.
+    # The demand_daily rollup stays in the hot files, so suggestions keep their history.
+    cutoff = f"-{int(days)} days"
+    conn = get_connection()
+    try:
+        moved = _archive_file(conn, ARCHIVED_TABLES, cutoff)
+    finally:
+        conn.close()
+    for _, path in produto.shard_paths():
+        conn = sqlite3.connect(path)
+        try:
+            for table, count in _archive_file(conn, ("orders", "order_items"), cutoff).items():
+                moved[table] += count
+        finally:
+            conn.close()
+    return moved
+
+
+def _maintain_file(conn: sqlite3.Connection, path: str, vacuum_pages: int) -> Dict[str, Any]:
+    conn.isolation_level = None
+    stats: Dict[str, Any] = {
+        "pages_before": conn.execute("PRAGMA page_count").fetchone()[0],
+        "free_pages_before": conn.execute("PRAGMA freelist_count").fetchone()[0],
+    }
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # switching to incremental mode only takes effect after one full VACUUM
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        stats["full_vacuum"] = True
+    conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    stats["pages_after"] = conn.execute("PRAGMA page_count").fetchone()[0]
+    stats["free_pages_after"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    stats["size_bytes"] = os.path.getsize(path)
+    return stats
+
+
+def run_maintenance(vacuum_pages: int = 0) -> Dict[str, Any]:
+    # Incremental vacuum (0 = release every free page) plus planner statistics refresh,
+    # on the main database and on every store shard
+    conn = get_connection()
+    try:
+        stats = _maintain_file(conn, produto.DB_PATH, vacuum_pages)
+    finally:
+        conn.close()
+    shards = produto.shard_paths()
+    if shards:
+        stats["shards"] = {}
+        for code, path in shards:
+            conn = sqlite3.connect(path)
+            try:
+                stats["shards"][code] = _maintain_file(conn, path, vacuum_pages)
+            finally:
+                conn.close()
+    return stats
+
+
+def maintain(archive_days: Optional[int] = None, vacuum_pages: int = 0) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    if archive_days is not None:
+        result["archived"] = archive_old_rows(archive_days)
+    result["maintenance"] = run_maintenance(vacuum_pages)
+    return result
+
+
+_scheduler: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def run_maintenance_loop(interval_seconds: float, archive_days: Optional[int] = None) -> None:
+    # Blocking loop; runs on the scheduler thread or as the target of a dedicated process
+    while not _stop.wait(interval_seconds):
+        try:
+            maintain(archive_days)
+        except Exception:
+            # a busy database just postpones maintenance to the next tick
+            logger.exception("scheduled maintenance failed")
+
+
+def start_maintenance_scheduler(interval_seconds: float, archive_days: Optional[int] = None) -> None:
+    global _scheduler
+    if _scheduler is not None:
+        return
+    _stop.clear()
+    _scheduler = threading.Thread(
+        target=run_maintenance_loop, args=(interval_seconds, archive_days), name="horti-maintenance", daemon=True
+    )
+    _scheduler.start()
+
+
+def stop_maintenance_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _stop.set()
+        _scheduler.join()
+        _scheduler = None
+
+
+def main() -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Archive old rows and run VACUUM/ANALYZE/optimize")
+    parser.add_argument("--archive-days", type=int, default=None, help="archive orders/plans older than N days")
+    parser.add_argument("--vacuum-pages", type=int, default=0, help="pages to release (0 = all free pages)")
+    args = parser.parse_args()
+    return maintain(args.archive_days, args.vacuum_pages)
+
+
+if __name__ == "__main__":
+    print(main())
@@ -1,21 +1,261 @@
 import os
 import sqlite3
-from typing import Iterable, List, Optional, Tuple, Dict, Any
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Dict, Any
+
+from models.write_queue import active_coordinator
 
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "database", "horti.db")
 DB_PATH = os.path.abspath(DB_PATH)
+ARCHIVE_PATH = os.path.join(os.path.dirname(DB_PATH), "horti_archive.db")
+
+# Tables whose closed/old rows can be moved to the archive database
+ARCHIVED_TABLES = ("orders", "order_items", "logistics_plan", "logistics_received", "logistics_distribution")
+
+# Tables that live in the per-store shard files when HORTI_SHARDED=1
+SHARDED_TABLES = ("orders", "order_items", "demand_daily")
+
+# Shard order ids start at store_id * SHARD_ID_BLOCK so ids stay unique across files
+SHARD_ID_BLOCK = 1_000_000_000
+
+# Columns of the tables that are spread over several files (archive, shards); copies and
+# union views name them explicitly since older databases may carry extra legacy columns
+TABLE_COLUMNS = {
+    "orders": "id, store_id, created_at",
+    "order_items": "id, order_id, product_id, quantity",
+    "demand_daily": "store_id, product_id, day, quantity",
+    "logistics_plan": "id, product_id, supplier_id, expected_quantity, created_at, sent_to_logistics",
+    "logistics_received": "id, logistics_plan_id, received_quantity, updated_at",
+    "logistics_distribution": "id, logistics_plan_id, store_id, quantity",
+}
+
+
+# When set (by the request profiler), every statement run on connections opened in
+# this context is appended to the list
+SQL_TRACE: ContextVar[Optional[List[str]]] = ContextVar("SQL_TRACE", default=None)
 
 
 def get_connection() -> sqlite3.Connection:
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    statements = SQL_TRACE.get()
+    if statements is not None:
+        conn.set_trace_callback(statements.append)
     return conn
 
 
+def sharding_enabled() -> bool:
+    return os.environ.get("HORTI_SHARDED") == "1"
+
+
+def shard_dir() -> str:
+    return os.path.join(os.path.dirname(DB_PATH), "shards")
+
+
+def shard_paths() -> List[Tuple[str, str]]:
+    # (store_code, path) of every existing shard file
+    directory = shard_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        (name[len("orders_"):-len(".db")], os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.startswith("orders_") and name.endswith(".db")
+    )
+
+
+def get_shard_connection(store_code: str) -> sqlite3.Connection:
+    # Intake connection for one store: its own file for orders/order_items/demand_daily,
+    # with the shared database attached read-side as "ref" for store/product lookups
+    with get_connection() as conn:
+        store = conn.execute("SELECT id, code FROM stores WHERE code = ?", (store_code,)).fetchone()
+    if not store:
+        raise ValueError("Unknown store code")
+    os.makedirs(shard_dir(), exist_ok=True)
+    conn = sqlite3.connect(os.path.join(shard_dir(), f"orders_{store['code']}.db"))
+    conn.row_factory = sqlite3.Row
+    statements = SQL_TRACE.get()
+    if statements is not None:
+        conn.set_trace_callback(statements.append)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'orders'").fetchone() is None:
+        # WAL so an open streaming read never blocks this store's intake
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_ORDERS_DDL)
+        conn.execute(_ORDER_ITEMS_DDL)
+        conn.execute(_DEMAND_DAILY_DDL)
+        conn.execute(_DEMAND_DAILY_INDEX)
+        conn.executemany(
+            "INSERT INTO sqlite_sequence(name, seq) VALUES(?, ?)",
+            [("orders", int(store["id"]) * SHARD_ID_BLOCK), ("order_items", int(store["id"]) * SHARD_ID_BLOCK)],
+        )
+        conn.commit()
+    conn.execute("ATTACH DATABASE ? AS ref", (DB_PATH,))
+    return conn
+
+
+def get_read_connection(include_archive: bool = False) -> sqlite3.Connection:
+    # Archive (include_archive) and store shards (sharded mode) are attached and temp
+    # views shadow their tables with the union of every file, so report queries run unchanged
+    conn = get_connection()
+    sources: Dict[str, List[str]] = {}
+    attachments: List[Tuple[str, str, Iterable[str]]] = []
+    if include_archive and os.path.exists(ARCHIVE_PATH):
+        attachments.append(("archive", ARCHIVE_PATH, ARCHIVED_TABLES))
+    if sharding_enabled():
+        attachments += [(f"shard_{i}", path, SHARDED_TABLES) for i, (_, path) in enumerate(shard_paths())]
+    for schema, path, tables in attachments:
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        present = {row["name"] for row in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")}
+        for table in tables:
+            if table in present:
+                sources.setdefault(table, []).append(schema)
+    for table, schemas in sources.items():
+        columns = TABLE_COLUMNS[table]
+        union = " UNION ALL ".join(f"SELECT {columns} FROM {schema}.{table}" for schema in ["main"] + schemas)
+        conn.execute(f"CREATE TEMP VIEW {table} AS {union}")
+    return conn
+
+
+def iter_query(sql: str, params: Iterable[Any] = (), include_archive: bool = False, chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+    # Yield rows from the cursor in chunks instead of materializing the whole result
+    conn = get_read_connection(include_archive)
+    try:
+        cur = conn.execute(sql, tuple(params))
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+def run_write(fn: Callable[..., Any], *args: Any) -> Any:
+    # Apply fn(conn, *args) through the write coordinator when it is running,
+    # otherwise in a transaction of its own. Either way the write lock is taken before fn
+    # runs (BEGIN IMMEDIATE), so what fn reads first (e.g. MAX(id)) cannot be changed by
+    # another process before its own inserts.
+    coordinator = active_coordinator()
+    if coordinator is not None:
+        return coordinator.submit(fn, *args)
+    with get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        result = fn(conn, *args)
+        conn.commit()
+        return result
+
+
+# Adds the items of the selected orders to the daily rollup (incremental upsert)
+_DEMAND_ROLLUP_SQL = (
+    "INSERT INTO demand_daily(store_id, product_id, day, quantity) "
+    "SELECT o.store_id, oi.product_id, date(o.created_at), SUM(oi.quantity) "
+    "FROM orders o JOIN order_items oi ON oi.order_id = o.id WHERE {where} "
+    "GROUP BY o.store_id, oi.product_id, date(o.created_at) "
+    "ON CONFLICT(store_id, product_id, day) DO UPDATE SET quantity = quantity + excluded.quantity"
+)
+
+
+# Intake tables: created in the main database and, in sharded mode, in every store shard
+_ORDERS_DDL = """
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id INTEGER NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        FOREIGN KEY(store_id) REFERENCES stores(id)
+    );
+    """
+
+_ORDER_ITEMS_DDL = """
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        FOREIGN KEY(order_id) REFERENCES orders(id),
+        FOREIGN KEY(product_id) REFERENCES products(id)
+    );
+    """
+
+_DEMAND_DAILY_DDL = """
+    CREATE TABLE IF NOT EXISTS demand_daily (
+        store_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        quantity REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY(store_id, product_id, day),
+        FOREIGN KEY(store_id) REFERENCES stores(id),
+        FOREIGN KEY(product_id) REFERENCES products(id)
+    ) WITHOUT ROWID;
+    """
+
+_DEMAND_DAILY_INDEX = "CREATE INDEX IF NOT EXISTS idx_demand_daily_day ON demand_daily(day)"
+
+# Logistics tables: created in the main database and, once archiving runs, in the archive
+_LOGISTICS_PLAN_DDL = """
+    CREATE TABLE IF NOT EXISTS logistics_plan (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        supplier_id INTEGER,
+        expected_quantity REAL NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')),
+        sent_to_logistics INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY(product_id) REFERENCES products(id),
+        FOREIGN KEY(supplier_id) REFERENCES suppliers(id)
+    );
+    """
+
+_LOGISTICS_PLAN_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_logistics_plan_supplier ON logistics_plan(supplier_id, sent_to_logistics)"
+)
+
+_LOGISTICS_RECEIVED_DDL = """
+    CREATE TABLE IF NOT EXISTS logistics_received (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        logistics_plan_id INTEGER NOT NULL,
+        received_quantity REAL NOT NULL,
+        updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+        FOREIGN KEY(logistics_plan_id) REFERENCES logistics_plan(id)
+    );
+    """
+
+_LOGISTICS_DISTRIBUTION_DDL = """
+    CREATE TABLE IF NOT EXISTS logistics_distribution (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        logistics_plan_id INTEGER NOT NULL,
+        store_id INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        UNIQUE(logistics_plan_id, store_id),
+        FOREIGN KEY(logistics_plan_id) REFERENCES logistics_plan(id),
+        FOREIGN KEY(store_id) REFERENCES stores(id)
+    );
+    """
+
+# Statements creating each table spread over several files, with its keys and indexes
+TABLE_DDL = {
+    "orders": (_ORDERS_DDL,),
+    "order_items": (_ORDER_ITEMS_DDL,),
+    "demand_daily": (_DEMAND_DAILY_DDL, _DEMAND_DAILY_INDEX),
+    "logistics_plan": (_LOGISTICS_PLAN_DDL, _LOGISTICS_PLAN_INDEX),
+    "logistics_received": (_LOGISTICS_RECEIVED_DDL,),
+    "logistics_distribution": (_LOGISTICS_DISTRIBUTION_DDL,),
+}
+
+
 def init_schema() -> None:
     with get_connection() as conn:
+        # WAL (persisted in the file): streamed list responses keep a read cursor open
+        # until the client has the whole body, which in rollback-journal mode would
+        # block every writer for that long
+        conn.execute("PRAGMA journal_mode=WAL")
+        for _, path in shard_paths():
+            shard = sqlite3.connect(path)
+            try:
+                shard.execute("PRAGMA journal_mode=WAL")
+            finally:
+                shard.close()
         cur = conn.cursor()
         # products
         cur.execute(
@@ -51,59 +291,19 @@ def init_schema() -> None:
         )
 
         # orders (by store)
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                store_id INTEGER NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY(store_id) REFERENCES stores(id)
-            );
-            """
-        )
+        cur.execute(_ORDERS_DDL)
 
         # order items
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS order_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                FOREIGN KEY(order_id) REFERENCES orders(id),
-                FOREIGN KEY(product_id) REFERENCES products(id)
-            );
-            """
-        )
+        cur.execute(_ORDER_ITEMS_DDL)
 
         # purchases consolidated for logistics
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS logistics_plan (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                supplier_id INTEGER,
-                expected_quantity REAL NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                sent_to_logistics INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY(product_id) REFERENCES products(id),
-                FOREIGN KEY(supplier_id) REFERENCES suppliers(id)
-            );
-            """
-        )
+        cur.execute(_LOGISTICS_PLAN_DDL)
+
+        # supplier-filtered logistics views (per-supplier plans)
+        cur.execute(_LOGISTICS_PLAN_INDEX)
 
         # received quantities in logistics
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS logistics_received (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                logistics_plan_id INTEGER NOT NULL,
-                received_quantity REAL NOT NULL,
-                updated_at TEXT NOT NULL DEFAULT (datetime('now')),
-                FOREIGN KEY(logistics_plan_id) REFERENCES logistics_plan(id)
-            );
-            """
-        )
+        cur.execute(_LOGISTICS_RECEIVED_DDL)
 
         # assignment of supplier per store/product (for current cycle)
         cur.execute(
@@ -122,22 +322,21 @@ def init_schema() -> None:
         )
 
         # logistics distribution: how expected/received is split to stores per product
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS logistics_distribution (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                logistics_plan_id INTEGER NOT NULL,
-                store_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                UNIQUE(logistics_plan_id, store_id),
-                FOREIGN KEY(logistics_plan_id) REFERENCES logistics_plan(id),
-                FOREIGN KEY(store_id) REFERENCES stores(id)
-            );
-            """
-        )
+        cur.execute(_LOGISTICS_DISTRIBUTION_DDL)
+
+        # demand history: daily quantities per store/product, rolled up from orders
+        cur.execute(_DEMAND_DAILY_DDL)
+        cur.execute(_DEMAND_DAILY_INDEX)
 
         conn.commit()
 
+        # backfill the rollup once for databases that already have orders; check and insert
+        # share one write lock so workers starting together cannot both backfill
+        cur.execute("BEGIN IMMEDIATE")
+        if cur.execute("SELECT 1 FROM demand_daily LIMIT 1").fetchone() is None:
+            cur.execute(_DEMAND_ROLLUP_SQL.format(where="1=1"))
+        conn.commit()
+
 
 DEFAULT_STORES = [
     ("PIT", "PITUBA"),
@@ -179,6 +378,22 @@ def seed_default_suppliers() -> None:
         conn.commit()
 
 
+def initialize_database(excel_path: Optional[str] = None) -> int:
+    # Schema + default stores/suppliers, optionally importing products from an Excel file
+    from utils.import_excel import import_products_from_excel
+
+    init_schema()
+    seed_default_stores()
+    seed_default_suppliers()
+    imported = 0
+    if excel_path:
+        try:
+            imported = import_products_from_excel(excel_path)
+        except Exception:
+            imported = 0
+    return imported
+
+
 def upsert_product(code: str, name: str, unit: str) -> None:
     unit = unit.upper()
     if unit not in ("KG", "UN"):
@@ -191,7 +406,7 @@ def upsert_product(code: str, name: str, unit: str) -> None:
         conn.commit()
 
 
-def list_products(search: Optional[str] = None) -> List[Dict[str, Any]]:
+def iter_products(search: Optional[str] = None) -> Iterator[Dict[str, Any]]:
     sql = "SELECT id, code, name, unit FROM products"
     params: Tuple[Any, ...] = tuple()
     if search:
@@ -199,48 +414,69 @@ def list_products(search: Optional[str] = None) -> List[Dict[str, Any]]:
         like = f"%{search}%"
         params = (like, like)
     sql += " ORDER BY code ASC"
+    return iter_query(sql, params)
+
+
+def list_products(search: Optional[str] = None) -> List[Dict[str, Any]]:
+    return list(iter_products(search))
+
+
+def list_stores() -> List[Dict[str, Any]]:
     with get_connection() as conn:
-        rows = conn.execute(sql, params).fetchall()
+        rows = conn.execute("SELECT id, code, name FROM stores ORDER BY id").fetchall()
         return [dict(row) for row in rows]
 
 
-def get_or_create_supplier(name: str) -> int:
+def _get_or_create_supplier(conn: sqlite3.Connection, name: str) -> int:
     name = name.strip()
-    with get_connection() as conn:
-        row = conn.execute("SELECT id FROM suppliers WHERE name = ?", (name,)).fetchone()
-        if row:
-            return int(row["id"])
-        cur = conn.execute("INSERT INTO suppliers(name) VALUES(?)", (name,))
-        conn.commit()
-        return int(cur.lastrowid)
+    row = conn.execute("SELECT id FROM suppliers WHERE name = ?", (name,)).fetchone()
+    if row:
+        return int(row["id"])
+    cur = conn.execute("INSERT INTO suppliers(name) VALUES(?)", (name,))
+    return int(cur.lastrowid)
 
 
-def create_order(store_code: str, supplier_name: Optional[str], items: List[Dict[str, Any]]) -> int:
-    with get_connection() as conn:
-        store = conn.execute("SELECT id FROM stores WHERE code = ?", (store_code,)).fetchone()
-        if not store:
-            raise ValueError("Unknown store code")
-        cur = conn.execute(
-            "INSERT INTO orders(store_id) VALUES(?)",
-            (int(store["id"]),),
+def get_or_create_supplier(name: str) -> int:
+    return run_write(_get_or_create_supplier, name)
+
+
+def _create_order(conn: sqlite3.Connection, store_code: str, items: List[Dict[str, Any]]) -> int:
+    store = conn.execute("SELECT id FROM stores WHERE code = ?", (store_code,)).fetchone()
+    if not store:
+        raise ValueError("Unknown store code")
+    cur = conn.execute(
+        "INSERT INTO orders(store_id) VALUES(?)",
+        (int(store["id"]),),
+    )
+    order_id = int(cur.lastrowid)
+
+    for item in items:
+        code = str(item["code"]).strip()
+        qty = float(item["quantity"])
+        prod = conn.execute("SELECT id FROM products WHERE code = ?", (code,)).fetchone()
+        if not prod:
+            raise ValueError(f"Unknown product code: {code}")
+        conn.execute(
+            "INSERT INTO order_items(order_id, product_id, quantity) VALUES(?, ?, ?)",
+            (order_id, int(prod["id"]), qty),
         )
-        order_id = int(cur.lastrowid)
-
-        for item in items:
-            code = str(item["code"]).strip()
-            qty = float(item["quantity"])
-            prod = conn.execute("SELECT id FROM products WHERE code = ?", (code,)).fetchone()
-            if not prod:
-                raise ValueError(f"Unknown product code: {code}")
-            conn.execute(
-                "INSERT INTO order_items(order_id, product_id, quantity) VALUES(?, ?, ?)",
-                (order_id, int(prod["id"]), qty),
-            )
-        conn.commit()
-        return order_id
+    conn.execute(_DEMAND_ROLLUP_SQL.format(where="o.id = ?"), (order_id,))
+    return order_id
 
 
-def list_orders(store_code: Optional[str] = None, supplier: Optional[str] = None) -> List[Dict[str, Any]]:
+def create_order(store_code: str, supplier_name: Optional[str], items: List[Dict[str, Any]]) -> int:
+    if sharding_enabled():
+        # each store writes its own file, so intake from different stores never contends
+        conn = get_shard_connection(store_code)
+        try:
+            with conn:
+                return _create_order(conn, store_code, items)
+        finally:
+            conn.close()
+    return run_write(_create_order, store_code, items)
+
+
+def iter_orders(store_code: Optional[str] = None, supplier: Optional[str] = None, include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     sql = (
         "SELECT o.id, o.created_at, s.code AS store_code, s.name AS store_name "
         "FROM orders o JOIN stores s ON s.id = o.store_id WHERE 1=1"
@@ -250,22 +486,24 @@ def list_orders(store_code: Optional[str] = None, supplier: Optional[str] = None
         sql += " AND s.code = ?"
         params.append(store_code)
     sql += " ORDER BY o.created_at DESC, o.id DESC"
-    with get_connection() as conn:
-        rows = conn.execute(sql, tuple(params)).fetchall()
-        return [dict(row) for row in rows]
+    return iter_query(sql, tuple(params), include_archive)
+
+
+def list_orders(store_code: Optional[str] = None, supplier: Optional[str] = None, include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_orders(store_code, supplier, include_archive))
 
 
-def list_order_items(order_id: int) -> List[Dict[str, Any]]:
+def list_order_items(order_id: int, include_archive: bool = False) -> List[Dict[str, Any]]:
     sql = (
         "SELECT p.code, p.name, p.unit, oi.quantity FROM order_items oi "
         "JOIN products p ON p.id = oi.product_id WHERE oi.order_id = ? ORDER BY p.code"
     )
-    with get_connection() as conn:
+    with get_read_connection(include_archive) as conn:
         rows = conn.execute(sql, (order_id,)).fetchall()
         return [dict(row) for row in rows]
 
 
-def list_store_order_totals(store_code: str) -> List[Dict[str, Any]]:
+def iter_store_order_totals(store_code: str, include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     # Per store, per product totals across orders
     sql = (
         "SELECT p.id as product_id, p.code, p.name, p.unit, SUM(oi.quantity) as quantity "
@@ -273,24 +511,28 @@ def list_store_order_totals(store_code: str) -> List[Dict[str, Any]]:
         "JOIN products p ON p.id = oi.product_id JOIN stores s ON s.id = o.store_id "
         "WHERE s.code = ? GROUP BY p.id, p.code, p.name, p.unit ORDER BY p.code"
     )
-    with get_connection() as conn:
-        rows = conn.execute(sql, (store_code,)).fetchall()
-        return [dict(row) for row in rows]
+    return iter_query(sql, (store_code,), include_archive)
+
+
+def list_store_order_totals(store_code: str, include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_store_order_totals(store_code, include_archive))
+
+
+def _assign_supplier(conn: sqlite3.Connection, store_code: str, product_code: str, supplier_name: str) -> None:
+    store = conn.execute("SELECT id FROM stores WHERE code = ?", (store_code,)).fetchone()
+    prod = conn.execute("SELECT id FROM products WHERE code = ?", (product_code,)).fetchone()
+    if not store or not prod:
+        raise ValueError("Unknown store or product")
+    supplier_id = _get_or_create_supplier(conn, supplier_name)
+    conn.execute(
+        "INSERT INTO supplier_assignments(store_id, product_id, supplier_id) VALUES(?, ?, ?) "
+        "ON CONFLICT(store_id, product_id) DO UPDATE SET supplier_id=excluded.supplier_id",
+        (int(store["id"]), int(prod["id"]), supplier_id),
+    )
 
 
 def assign_supplier(store_code: str, product_code: str, supplier_name: str) -> None:
-    with get_connection() as conn:
-        store = conn.execute("SELECT id FROM stores WHERE code = ?", (store_code,)).fetchone()
-        prod = conn.execute("SELECT id FROM products WHERE code = ?", (product_code,)).fetchone()
-        supplier_id = get_or_create_supplier(supplier_name)
-        if not store or not prod:
-            raise ValueError("Unknown store or product")
-        conn.execute(
-            "INSERT INTO supplier_assignments(store_id, product_id, supplier_id) VALUES(?, ?, ?) "
-            "ON CONFLICT(store_id, product_id) DO UPDATE SET supplier_id=excluded.supplier_id",
-            (int(store["id"]), int(prod["id"]), supplier_id),
-        )
-        conn.commit()
+    run_write(_assign_supplier, store_code, product_code, supplier_name)
 
 
 def list_assignments(store_code: str) -> List[Dict[str, Any]]:
@@ -304,7 +546,131 @@ def list_assignments(store_code: str) -> List[Dict[str, Any]]:
         return [dict(row) for row in rows]
 
 
-def consolidated_by_supplier() -> List[Dict[str, Any]]:
+_ORDERED_PAIRS_SQL = "SELECT DISTINCT o.store_id, oi.product_id FROM orders o JOIN order_items oi ON oi.order_id = o.id"
+
+# Supplier most often assigned to each product across stores
+_USUAL_SUPPLIER_SQL = (
+    "SELECT product_id, supplier FROM (SELECT sa.product_id, sp.name as supplier, ROW_NUMBER() OVER "
+    "(PARTITION BY sa.product_id ORDER BY COUNT(*) DESC, sa.supplier_id) as rn "
+    "FROM supplier_assignments sa JOIN suppliers sp ON sp.id = sa.supplier_id "
+    "GROUP BY sa.product_id, sa.supplier_id) WHERE rn = 1"
+)
+
+
+def _supplier_name(value: Any) -> str:
+    # null, missing or blank names would otherwise become suppliers "None" / ""
+    name = str(value).strip() if value is not None else ""
+    if not name:
+        raise ValueError("supplier must be a non-empty name")
+    return name
+
+
+def _bulk_assign_suppliers(
+    conn: sqlite3.Connection,
+    assignments: List[Dict[str, Any]],
+    rules: List[Dict[str, Any]],
+    ordered_pairs: List[Tuple[int, int]],
+    replace: bool,
+    dry_run: bool,
+) -> Dict[str, Any]:
+    stores = {r["code"]: int(r["id"]) for r in conn.execute("SELECT id, code FROM stores")}
+    products = {r["code"]: int(r["id"]) for r in conn.execute("SELECT id, code FROM products")}
+    store_codes = {v: k for k, v in stores.items()}
+    product_codes = {v: k for k, v in products.items()}
+    current: Dict[Tuple[int, int], str] = {
+        (int(r["store_id"]), int(r["product_id"])): r["supplier"]
+        for r in conn.execute(
+            "SELECT sa.store_id, sa.product_id, sp.name as supplier FROM supplier_assignments sa "
+            "JOIN suppliers sp ON sp.id = sa.supplier_id"
+        )
+    }
+
+    # precedence: copied-forward < rules < explicit matrix entries
+    desired: Dict[Tuple[int, int], str] = {} if replace else dict(current)
+    # copy-forward: ordered pairs without an assignment take the product's usual supplier
+    if ordered_pairs:
+        usual = {int(r["product_id"]): r["supplier"] for r in conn.execute(_USUAL_SUPPLIER_SQL)}
+        for key in ordered_pairs:
+            if key not in current and key[1] in usual:
+                desired.setdefault(key, usual[key[1]])
+    unknown: List[str] = []
+    for rule in rules:
+        product_id = products.get(str(rule.get("product_code", "")).strip())
+        if product_id is None:
+            unknown.append(f"product {rule.get('product_code')}")
+            continue
+        for code in rule.get("stores") or list(stores):
+            if code not in stores:
+                unknown.append(f"store {code}")
+                continue
+            desired[(stores[code], product_id)] = _supplier_name(rule.get("supplier"))
+    for item in assignments:
+        store_id = stores.get(item.get("store_code"))
+        product_id = products.get(str(item.get("product_code", "")).strip())
+        if store_id is None or product_id is None:
+            unknown.append(f"{item.get('store_code')}/{item.get('product_code')}")
+            continue
+        desired[(store_id, product_id)] = _supplier_name(item.get("supplier"))
+    if unknown:
+        raise ValueError("Unknown store or product: " + ", ".join(sorted(set(unknown))))
+
+    def entry(key: Tuple[int, int], **extra: Any) -> Dict[str, Any]:
+        return {"store_code": store_codes[key[0]], "product_code": product_codes[key[1]], **extra}
+
+    added = [entry(k, supplier=v) for k, v in desired.items() if k not in current]
+    changed = [
+        entry(k, previous=current[k], supplier=v) for k, v in desired.items() if k in current and current[k] != v
+    ]
+    removed = [entry(k, previous=v) for k, v in current.items() if k not in desired]
+    diff = {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": len(desired) - len(added) - len(changed),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return diff
+
+    names = sorted(set(desired.values()))
+    conn.executemany("INSERT OR IGNORE INTO suppliers(name) VALUES(?)", [(n,) for n in names])
+    supplier_ids = {r["name"]: int(r["id"]) for r in conn.execute("SELECT id, name FROM suppliers")}
+    conn.executemany(
+        "DELETE FROM supplier_assignments WHERE store_id = ? AND product_id = ?",
+        [k for k in current if k not in desired],
+    )
+    conn.executemany(
+        "INSERT INTO supplier_assignments(store_id, product_id, supplier_id) VALUES(?, ?, ?) "
+        "ON CONFLICT(store_id, product_id) DO UPDATE SET supplier_id=excluded.supplier_id",
+        [(k[0], k[1], supplier_ids[v]) for k, v in desired.items() if current.get(k) != v],
+    )
+    return diff
+
+
+def bulk_assign_suppliers(
+    assignments: Any = None,
+    rules: Optional[List[Dict[str, Any]]] = None,
+    copy_forward: bool = False,
+    replace: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    # Apply a store x product -> supplier matrix, per-product rules and/or copy-forward
+    # of existing assignments in one transaction; returns the diff against the current state
+    if isinstance(assignments, dict):
+        # {"PIT": {"1778": "erico", ...}, ...}
+        assignments = [
+            {"store_code": store_code, "product_code": product_code, "supplier": supplier}
+            for store_code, products in assignments.items()
+            for product_code, supplier in products.items()
+        ]
+    # ordered pairs are read up front: in sharded mode orders live outside the write connection
+    ordered_pairs = (
+        [(int(r["store_id"]), int(r["product_id"])) for r in iter_query(_ORDERED_PAIRS_SQL)] if copy_forward else []
+    )
+    return run_write(_bulk_assign_suppliers, assignments or [], rules or [], ordered_pairs, replace, dry_run)
+
+
+def iter_consolidated_by_supplier(include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     # Sum totals per supplier using assignments; items without assignment won't appear
     sql = (
         "SELECT sp.name as supplier, p.code, p.name, p.unit, SUM(oi.quantity) as total_quantity "
@@ -313,24 +679,28 @@ def consolidated_by_supplier() -> List[Dict[str, Any]]:
         "JOIN products p ON p.id = oi.product_id JOIN suppliers sp ON sp.id = sa.supplier_id "
         "GROUP BY sp.name, p.code, p.name, p.unit ORDER BY sp.name, p.code"
     )
-    with get_connection() as conn:
-        rows = conn.execute(sql).fetchall()
-        return [dict(row) for row in rows]
+    return iter_query(sql, (), include_archive)
 
 
-def consolidate_purchases() -> List[Dict[str, Any]]:
+def consolidated_by_supplier(include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_consolidated_by_supplier(include_archive))
+
+
+def iter_consolidate_purchases(include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     # Sum quantities per product across all orders
     sql = (
         "SELECT p.id as product_id, p.code, p.name, p.unit, SUM(oi.quantity) as total_quantity "
         "FROM order_items oi JOIN products p ON p.id = oi.product_id "
         "GROUP BY p.id, p.code, p.name, p.unit ORDER BY p.code"
     )
-    with get_connection() as conn:
-        rows = conn.execute(sql).fetchall()
-        return [dict(row) for row in rows]
+    return iter_query(sql, (), include_archive)
 
 
-def store_totals(store_code: str) -> List[Dict[str, Any]]:
+def consolidate_purchases(include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_consolidate_purchases(include_archive))
+
+
+def iter_store_totals(store_code: str, include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     # Sum quantities per product for a given store across all its orders
     sql = (
         "SELECT p.code, p.name, p.unit, SUM(oi.quantity) as quantity "
@@ -342,25 +712,78 @@ def store_totals(store_code: str) -> List[Dict[str, Any]]:
         "GROUP BY p.code, p.name, p.unit "
         "ORDER BY p.code"
     )
-    with get_connection() as conn:
-        rows = conn.execute(sql, (store_code,)).fetchall()
-        return [dict(row) for row in rows]
+    return iter_query(sql, (store_code,), include_archive)
 
 
-def create_logistics_plan_from_consolidation(consolidated: List[Dict[str, Any]], supplier_name: Optional[str]) -> None:
-    supplier_id: Optional[int] = None
-    if supplier_name:
-        supplier_id = get_or_create_supplier(supplier_name)
-    with get_connection() as conn:
-        for row in consolidated:
-            conn.execute(
-                "INSERT INTO logistics_plan(product_id, supplier_id, expected_quantity, sent_to_logistics) VALUES(?, ?, ?, 1)",
-                (int(row["product_id"]), supplier_id, float(row["total_quantity"]))
-            )
-        conn.commit()
+def store_totals(store_code: str, include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_store_totals(store_code, include_archive))
 
 
-def list_logistics(filter_supplier: Optional[str] = None, search: Optional[str] = None) -> List[Dict[str, Any]]:
+# Ordered totals per (store, product) with the supplier assigned to that pair (NULL if none)
+_PLAN_LINES_SQL = (
+    "SELECT o.store_id, oi.product_id, sa.supplier_id, SUM(oi.quantity) as quantity "
+    "FROM orders o JOIN order_items oi ON oi.order_id = o.id "
+    "LEFT JOIN supplier_assignments sa ON sa.store_id = o.store_id AND sa.product_id = oi.product_id "
+    "GROUP BY o.store_id, oi.product_id, sa.supplier_id"
+)
+
+
+def _create_supplier_plans(
+    conn: sqlite3.Connection,
+    lines: List[Tuple[int, int, Optional[int], float]],
+    fallback_supplier: Optional[str],
+) -> Dict[str, Any]:
+    fallback_id = _get_or_create_supplier(conn, fallback_supplier) if fallback_supplier else None
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logistics_plan").fetchone()[0]
+    conn.execute(
+        "CREATE TEMP TABLE plan_lines (store_id INTEGER, product_id INTEGER, supplier_id INTEGER, quantity REAL)"
+    )
+    try:
+        conn.executemany("INSERT INTO temp.plan_lines VALUES(?, ?, ?, ?)", lines)
+        # unassigned (store, product) pairs go to the fallback supplier, if any
+        conn.execute("UPDATE temp.plan_lines SET supplier_id = ? WHERE supplier_id IS NULL", (fallback_id,))
+        # one plan row per (product, supplier), then each store's ordered quantity as its
+        # initial share; plans of this run are the ids above first_id (read under the
+        # write lock run_write holds, so no other writer can insert in between)
+        conn.execute(
+            "INSERT INTO logistics_plan(product_id, supplier_id, expected_quantity, sent_to_logistics) "
+            "SELECT product_id, supplier_id, SUM(quantity), 1 FROM temp.plan_lines "
+            "GROUP BY product_id, supplier_id ORDER BY product_id, supplier_id"
+        )
+        distributed = conn.execute(
+            "INSERT INTO logistics_distribution(logistics_plan_id, store_id, quantity) "
+            "SELECT lp.id, pl.store_id, SUM(pl.quantity) FROM temp.plan_lines pl "
+            "JOIN logistics_plan lp ON lp.id > ? AND lp.product_id = pl.product_id AND lp.supplier_id IS pl.supplier_id "
+            "GROUP BY lp.id, pl.store_id",
+            (first_id,),
+        ).rowcount
+        summary = conn.execute(
+            "SELECT COUNT(*) as plans, COUNT(DISTINCT supplier_id) as suppliers, "
+            "SUM(supplier_id IS NULL) as unassigned FROM logistics_plan WHERE id > ?",
+            (first_id,),
+        ).fetchone()
+    finally:
+        conn.execute("DROP TABLE temp.plan_lines")
+    return {
+        "count": summary["plans"],
+        "suppliers": summary["suppliers"],
+        "unassigned": summary["unassigned"] or 0,
+        "distribution_rows": distributed,
+    }
+
+
+def create_supplier_logistics_plans(fallback_supplier: Optional[str] = None) -> Dict[str, Any]:
+    # Send the current cycle to logistics: one plan per (product, assigned supplier) with
+    # each store's ordered quantity pre-filled as its distribution, in one transaction.
+    # Order lines are read up front: in sharded mode they live outside the write connection.
+    lines = [
+        (int(r["store_id"]), int(r["product_id"]), r["supplier_id"], float(r["quantity"]))
+        for r in iter_query(_PLAN_LINES_SQL)
+    ]
+    return run_write(_create_supplier_plans, lines, fallback_supplier)
+
+
+def iter_logistics(filter_supplier: Optional[str] = None, search: Optional[str] = None, include_archive: bool = False) -> Iterator[Dict[str, Any]]:
     sql = (
         "SELECT lp.id as plan_id, p.code, p.name, p.unit, sp.name as supplier, lp.expected_quantity, "
         "COALESCE(lr.received_quantity, 0) as received_quantity "
@@ -372,31 +795,279 @@ def list_logistics(filter_supplier: Optional[str] = None, search: Optional[str]
     )
     params: List[Any] = []
     if filter_supplier:
-        sql += " AND sp.name = ?"
+        sql += " AND lp.supplier_id = (SELECT id FROM suppliers WHERE name = ?)"
         params.append(filter_supplier)
     if search:
         sql += " AND (p.code LIKE ? OR p.name LIKE ?)"
         like = f"%{search}%"
         params.extend([like, like])
     sql += " ORDER BY p.code"
+    return iter_query(sql, tuple(params), include_archive)
+
+
+def list_logistics(filter_supplier: Optional[str] = None, search: Optional[str] = None, include_archive: bool = False) -> List[Dict[str, Any]]:
+    return list(iter_logistics(filter_supplier, search, include_archive))
+
+
+def list_logistics_suppliers() -> List[str]:
+    sql = (
+        "SELECT name FROM suppliers WHERE id IN "
+        "(SELECT supplier_id FROM logistics_plan WHERE sent_to_logistics = 1) ORDER BY name"
+    )
+    with get_connection() as conn:
+        return [r["name"] for r in conn.execute(sql).fetchall()]
+
+
+def supplier_plan(supplier: Optional[str] = None, search: Optional[str] = None) -> List[Dict[str, Any]]:
+    # Logistics items (optionally of one supplier) with their per-store distribution
+    sql = (
+        "SELECT lp.id as plan_id, p.code, p.name, p.unit, sp.name as supplier, lp.expected_quantity, "
+        "COALESCE(lr.received_quantity, 0) as received_quantity "
+        "FROM logistics_plan lp JOIN products p ON p.id = lp.product_id "
+        "LEFT JOIN suppliers sp ON sp.id = lp.supplier_id "
+        "LEFT JOIN logistics_received lr ON lr.logistics_plan_id = lp.id WHERE lp.sent_to_logistics = 1"
+    )
+    dist_sql = (
+        "SELECT ld.logistics_plan_id as plan_id, s.code as store_code, s.name as store_name, ld.quantity "
+        "FROM logistics_distribution ld JOIN logistics_plan lp ON lp.id = ld.logistics_plan_id "
+        "JOIN stores s ON s.id = ld.store_id WHERE lp.sent_to_logistics = 1"
+    )
+    params: List[Any] = []
+    if supplier:
+        supplier_filter = " AND lp.supplier_id = (SELECT id FROM suppliers WHERE name = ?)"
+        sql += supplier_filter
+        dist_sql += supplier_filter
+        params.append(supplier)
+    dist_sql += " ORDER BY ld.logistics_plan_id, s.code"
+    dist_params = tuple(params)
+    if search:
+        sql += " AND (p.code LIKE ? OR p.name LIKE ?)"
+        like = f"%{search}%"
+        params.extend([like, like])
+    sql += " ORDER BY p.code"
     with get_connection() as conn:
+        items = [dict(r, distribution=[]) for r in conn.execute(sql, tuple(params)).fetchall()]
+        # attach distribution per store, read in one query for all plans
+        by_plan = {it["plan_id"]: it for it in items}
+        for row in conn.execute(dist_sql, dist_params):
+            item = by_plan.get(row["plan_id"])
+            if item is not None:
+                item["distribution"].append({
+                    "store_code": row["store_code"],
+                    "store_name": row["store_name"],
+                    "quantity": row["quantity"],
+                })
+        return items
+
+
+def _update_received(conn: sqlite3.Connection, plan_id: int, received_quantity: float) -> None:
+    row = conn.execute("SELECT id FROM logistics_received WHERE logistics_plan_id = ?", (plan_id,)).fetchone()
+    if row:
+        conn.execute(
+            "UPDATE logistics_received SET received_quantity = ?, updated_at = datetime('now') WHERE id = ?",
+            (received_quantity, int(row["id"]))
+        )
+    else:
+        conn.execute(
+            "INSERT INTO logistics_received(logistics_plan_id, received_quantity) VALUES(?, ?)",
+            (plan_id, received_quantity)
+        )
+
+
+def update_received(plan_id: int, received_quantity: float) -> None:
+    run_write(_update_received, plan_id, received_quantity)
+
+
+def _save_distribution(conn: sqlite3.Connection, plan_id: int, distribution: List[Dict[str, Any]]) -> None:
+    # distribution: [{store_code, quantity}]; unknown store codes are ignored
+    for d in distribution:
+        store = conn.execute("SELECT id FROM stores WHERE code = ?", (d.get("store_code"),)).fetchone()
+        if not store:
+            continue
+        conn.execute(
+            "INSERT INTO logistics_distribution(logistics_plan_id, store_id, quantity) VALUES(?, ?, ?) "
+            "ON CONFLICT(logistics_plan_id, store_id) DO UPDATE SET quantity=excluded.quantity",
+            (plan_id, int(store["id"]), float(d.get("quantity", 0)))
+        )
+
+
+def save_distribution(plan_id: int, distribution: List[Dict[str, Any]]) -> None:
+    run_write(_save_distribution, plan_id, distribution)
+
+
+
+
+def demand_history(
+    store_code: Optional[str] = None,
+    product_code: Optional[str] = None,
+    granularity: str = "day",
+    days: int = 56,
+) -> List[Dict[str, Any]]:
+    # Rolled-up quantities per store/product by day or week; a week is labelled with the
+    # date of its Monday so weeks spanning New Year stay in one bucket
+    if granularity not in ("day", "week"):
+        raise ValueError("granularity must be 'day' or 'week'")
+    bucket = "dd.day" if granularity == "day" else "date(dd.day, '-6 days', 'weekday 1')"
+    sql = (
+        f"SELECT {bucket} as period, s.code as store_code, p.code, p.name, p.unit, SUM(dd.quantity) as quantity "
+        "FROM demand_daily dd JOIN stores s ON s.id = dd.store_id JOIN products p ON p.id = dd.product_id "
+        "WHERE dd.day > date('now', ?)"
+    )
+    params: List[Any] = [f"-{int(days)} days"]
+    if store_code:
+        sql += " AND s.code = ?"
+        params.append(store_code)
+    if product_code:
+        sql += " AND p.code = ?"
+        params.append(product_code)
+    sql += " GROUP BY period, s.code, p.code, p.name, p.unit ORDER BY period, s.code, p.code"
+    with get_read_connection() as conn:
         rows = conn.execute(sql, tuple(params)).fetchall()
         return [dict(row) for row in rows]
 
 
-def update_received(plan_id: int, received_quantity: float) -> None:
-    with get_connection() as conn:
-        row = conn.execute("SELECT id FROM logistics_received WHERE logistics_plan_id = ?", (plan_id,)).fetchone()
-        if row:
-            conn.execute(
-                "UPDATE logistics_received SET received_quantity = ?, updated_at = datetime('now') WHERE id = ?",
-                (received_quantity, int(row["id"]))
-            )
-        else:
-            conn.execute(
-                "INSERT INTO logistics_received(logistics_plan_id, received_quantity) VALUES(?, ?)",
-                (plan_id, received_quantity)
-            )
-        conn.commit()
+def demand_window(end_day: str, days: int) -> List[Tuple[int, int, int, float]]:
+    # (store_id, product_id, age_in_days, quantity) for the `days` days ending at end_day
+    sql = (
+        "SELECT store_id, product_id, CAST(julianday(?) - julianday(day) AS INTEGER) as age, quantity "
+        "FROM demand_daily WHERE day > date(?, ?) AND day <= ?"
+    )
+    with get_read_connection() as conn:
+        return conn.execute(sql, (end_day, end_day, f"-{int(days)} days", end_day)).fetchall()
+
+
+def allocation_inputs(
+    plan_ids: Optional[List[int]] = None,
+    overwrite: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    # Open plans with a received quantity, plus the ordered totals of each plan's stores.
+    # Without explicit plan_ids only plans whose distribution does not add up to the
+    # received quantity are returned (unless overwrite), so earlier splits and manual
+    # corrections of settled plans are left alone.
+    plan_sql = (
+        "SELECT lp.id as plan_id, lp.product_id, p.code, p.unit, lr.received_quantity "
+        "FROM logistics_plan lp JOIN products p ON p.id = lp.product_id "
+        "JOIN logistics_received lr ON lr.logistics_plan_id = lp.id WHERE lp.sent_to_logistics = 1"
+    )
+    params: List[Any] = []
+    if plan_ids:
+        plan_sql += f" AND lp.id IN ({','.join('?' * len(plan_ids))})"
+        params.extend(int(i) for i in plan_ids)
+    elif not overwrite:
+        plan_sql += (
+            " AND ABS(lr.received_quantity - COALESCE((SELECT SUM(ld.quantity) FROM logistics_distribution ld "
+            "WHERE ld.logistics_plan_id = lp.id), 0)) > 1e-9"
+        )
+    plan_sql += " ORDER BY lp.id"
+    # a plan's stores are the ones in its distribution (pre-filled per supplier); plans
+    # without any distribution row fall back to every store that ordered the product
+    totals_sql = (
+        "SELECT lp.id as plan_id, o.store_id, SUM(oi.quantity) as quantity "
+        "FROM logistics_plan lp JOIN order_items oi ON oi.product_id = lp.product_id "
+        "JOIN orders o ON o.id = oi.order_id "
+        "WHERE lp.sent_to_logistics = 1 AND lp.id IN (SELECT logistics_plan_id FROM logistics_received) "
+        "AND (EXISTS (SELECT 1 FROM logistics_distribution ld WHERE ld.logistics_plan_id = lp.id AND ld.store_id = o.store_id) "
+        "OR NOT EXISTS (SELECT 1 FROM logistics_distribution ld WHERE ld.logistics_plan_id = lp.id)) "
+        "GROUP BY lp.id, o.store_id"
+    )
+    with get_read_connection() as conn:
+        plans = [dict(row) for row in conn.execute(plan_sql, tuple(params)).fetchall()]
+        totals = [dict(row) for row in conn.execute(totals_sql).fetchall()]
+        return plans, totals
+
+
+def _save_distributions(conn: sqlite3.Connection, rows: List[Tuple[int, int, float]]) -> None:
+    conn.executemany(
+        "INSERT INTO logistics_distribution(logistics_plan_id, store_id, quantity) VALUES(?, ?, ?) "
+        "ON CONFLICT(logistics_plan_id, store_id) DO UPDATE SET quantity=excluded.quantity",
+        rows,
+    )
+
+
+def save_distributions(rows: Iterable[Tuple[int, int, float]]) -> None:
+    # rows: (plan_id, store_id, quantity), written in a single transaction
+    run_write(_save_distributions, list(rows))
+
+
+# One aggregated pass over plans, receiving, distribution and order totals: a row per
+# (supplier, product, store) with the plan-level totals repeated through window sums.
+# Stores are those in the plan's distribution, or every ordering store if it has none;
+# a plan with no such store (e.g. its orders were archived) still gets one plan-level row.
+_RECONCILIATION_SQL = (
+    "WITH ordered AS (SELECT o.store_id, oi.product_id, SUM(oi.quantity) as ordered "
+    "FROM orders o JOIN order_items oi ON oi.order_id = o.id GROUP BY o.store_id, oi.product_id), "
+    "plans AS (SELECT lp.product_id, lp.supplier_id, SUM(lp.expected_quantity) as expected, "
+    "SUM(COALESCE(lr.received_quantity, 0)) as received, COUNT(lr.id) as receipts "
+    "FROM logistics_plan lp LEFT JOIN logistics_received lr ON lr.logistics_plan_id = lp.id "
+    "WHERE lp.sent_to_logistics = 1 GROUP BY lp.product_id, lp.supplier_id), "
+    "distributed AS (SELECT lp.product_id, lp.supplier_id, ld.store_id, SUM(ld.quantity) as distributed "
+    "FROM logistics_distribution ld JOIN logistics_plan lp ON lp.id = ld.logistics_plan_id "
+    "WHERE lp.sent_to_logistics = 1 GROUP BY lp.product_id, lp.supplier_id, ld.store_id) "
+    "SELECT * FROM (SELECT *, (in_plan OR (plan_stores = 0 AND ordered > 0)) as qualifies, "
+    "MAX(in_plan OR (plan_stores = 0 AND ordered > 0)) OVER (PARTITION BY product_id, supplier_id) as any_store, "
+    "ROW_NUMBER() OVER (PARTITION BY product_id, supplier_id ORDER BY store_code) as rn FROM ("
+    "SELECT pl.product_id, pl.supplier_id, sp.name as supplier, p.code, p.name, p.unit, pl.expected, pl.received, pl.receipts, "
+    "s.code as store_code, COALESCE(od.ordered, 0) as ordered, COALESCE(d.distributed, 0) as distributed, "
+    "SUM(COALESCE(d.distributed, 0)) OVER (PARTITION BY pl.product_id, pl.supplier_id) as distributed_total, "
+    "d.store_id IS NOT NULL as in_plan, "
+    "COUNT(d.store_id) OVER (PARTITION BY pl.product_id, pl.supplier_id) as plan_stores "
+    "FROM plans pl JOIN products p ON p.id = pl.product_id LEFT JOIN suppliers sp ON sp.id = pl.supplier_id "
+    "CROSS JOIN stores s "
+    "LEFT JOIN ordered od ON od.store_id = s.id AND od.product_id = pl.product_id "
+    "LEFT JOIN distributed d ON d.store_id = s.id AND d.product_id = pl.product_id "
+    "AND d.supplier_id IS pl.supplier_id)) "
+    "WHERE (qualifies OR (any_store = 0 AND rn = 1)) {supplier_filter}"
+    "ORDER BY supplier, code, store_code"
+)
 
 
+def reconciliation_report(supplier: Optional[str] = None, include_archive: bool = False) -> List[Dict[str, Any]]:
+    # Expected vs received vs distributed per supplier/product, with per-store ordered vs
+    # distributed, and discrepancy flags at both levels
+    sql = _RECONCILIATION_SQL.format(supplier_filter="AND supplier = ? " if supplier else "")
+    params = (supplier,) if supplier else ()
+    eps = 1e-9
+    items: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for row in iter_query(sql, params, include_archive):
+        if current is None or (current["supplier"], current["code"]) != (row["supplier"], row["code"]):
+            received = row["received"]
+            distributed_total = row["distributed_total"]
+            flags = []
+            # distribution is pre-filled from orders, so it is only checked once received
+            if not row["receipts"]:
+                flags.append("not_received")
+            else:
+                if received < row["expected"] - eps:
+                    flags.append("shortfall")
+                if distributed_total > received + eps:
+                    flags.append("over_distributed")
+                elif received > distributed_total + eps:
+                    flags.append("undistributed")
+            current = {
+                "supplier": row["supplier"],
+                "code": row["code"],
+                "name": row["name"],
+                "unit": row["unit"],
+                "expected_quantity": row["expected"],
+                "received_quantity": received,
+                "distributed_quantity": distributed_total,
+                "undistributed_quantity": max(received - distributed_total, 0.0),
+                "flags": flags,
+                "stores": [],
+            }
+            items.append(current)
+        if not row["qualifies"]:
+            continue
+        store_flags = []
+        if row["distributed"] < row["ordered"] - eps:
+            store_flags.append("short")
+        elif row["distributed"] > row["ordered"] + eps:
+            store_flags.append("over")
+        current["stores"].append({
+            "store_code": row["store_code"],
+            "ordered": row["ordered"],
+            "distributed": row["distributed"],
+            "flags": store_flags,
+        })
+    return items
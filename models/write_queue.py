@@ -0,0 +1,173 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+
+
+_STOP = object()
+
+
+# Single writer thread applying queued write operations in grouped transactions.
+# Each operation is a callable fn(conn, *args) that must not commit. Operations are
+# collected for at most max_latency seconds (or max_batch items), run inside one
+# BEGIN IMMEDIATE transaction with a savepoint each and committed together; a failing
+# operation only rolls back its own savepoint and its caller gets the exception.
+class WriteCoordinator:
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        max_batch: int = 64,
+        max_latency: float = 0.005,
+        timeout: Optional[float] = 30.0,
+    ) -> None:
+        self._connect = connect
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.timeout = timeout
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # set once the writer stops accepting work; guarded by _lock against racing submits
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="horti-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        # Pending operations queued before the stop marker are still applied; new ones
+        # are rejected from here on
+        if self._thread is not None:
+            with self._lock:
+                self._closed = True
+                self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        future: Future = Future()
+        with self._lock:
+            if self._closed or self._thread is None or not self._thread.is_alive():
+                raise RuntimeError("write coordinator is not running")
+            self._queue.put((fn, args, future))
+        try:
+            return future.result(self.timeout)
+        except FuturesTimeoutError:
+            # withdraw the operation so a caller that gave up (and may retry) never sees it
+            # applied later; if the writer already started it, wait for its outcome instead
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _run(self) -> None:
+        error: BaseException = RuntimeError("write coordinator stopped")
+        try:
+            self._loop()
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            # fail whatever is still queued so no caller waits on a dead writer
+            with self._lock:
+                self._closed = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP and item[2].set_running_or_notify_cancel():
+                    item[2].set_exception(error)
+
+    def _loop(self) -> None:
+        conn = self._connect()
+        try:
+            conn.isolation_level = None
+            conn.execute("PRAGMA journal_mode=WAL")
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_latency
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, batch: List[Tuple[Callable[..., Any], tuple, Future]]) -> None:
+        # operations whose caller timed out (and cancelled them) are dropped unapplied
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = fn(conn, *args)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, None, exc))
+                else:
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            for _, _, future in batch:
+                future.set_exception(exc)
+            if conn.in_transaction:
+                # may raise too (e.g. disk I/O error); the writer then stops and fails the rest
+                conn.execute("ROLLBACK")
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_active: Optional[WriteCoordinator] = None
+
+
+def start_write_coordinator(
+    connect: Callable[[], sqlite3.Connection],
+    max_batch: int = 64,
+    max_latency: float = 0.005,
+    timeout: Optional[float] = 30.0,
+) -> WriteCoordinator:
+    global _active
+    if _active is None:
+        _active = WriteCoordinator(connect, max_batch, max_latency, timeout)
+        _active.start()
+        atexit.register(stop_write_coordinator)
+    return _active
+
+
+def stop_write_coordinator() -> None:
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
+
+
+def active_coordinator() -> Optional[WriteCoordinator]:
+    return _active
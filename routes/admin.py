@@ -0,0 +1,80 @@
+from flask import Blueprint
+from flask import jsonify
+from flask import request
+from flask import send_file
+
+from models.backup import create_backup, list_backups
+from models.maintenance import maintain
+from utils.profiling import get_settings, update_settings, list_profiles, load_profile, profile_path, token_accepted
+
+
+admin_bp = Blueprint("admin", __name__)
+
+
+@admin_bp.route("/manutencao", methods=["POST"])  # archive old rows + vacuum/analyze/optimize
+def manutencao() -> tuple:
+    data = request.get_json(silent=True) or {}
+    archive_days = data.get("archive_days")
+    result = maintain(
+        int(archive_days) if archive_days is not None else None,
+        int(data.get("vacuum_pages", 0)),
+    )
+    return jsonify(result), 200
+
+
+@admin_bp.route("/backup", methods=["POST"])  # online snapshot: main + archive + shards, gzip, rotated
+def backup() -> tuple:
+    data = request.get_json(silent=True) or {}
+    options = {key: int(data[key]) for key in ("pages", "keep") if data.get(key) is not None}
+    try:
+        manifest = create_backup(**options)
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 500
+    return jsonify(manifest), 201
+
+
+@admin_bp.route("/backups", methods=["GET"])  # snapshot manifests, newest first (duration, sizes)
+def backups() -> tuple:
+    return jsonify(list_backups()), 200
+
+
+def _token_required() -> tuple:
+    return jsonify({"error": "profiling token required (X-Profile header)"}), 403
+
+
+@admin_bp.route("/profiling", methods=["GET", "POST"])  # read or toggle sampled profiling
+def profiling() -> tuple:
+    if not token_accepted():
+        return _token_required()
+    if request.method == "GET":
+        return jsonify(get_settings()), 200
+    data = request.get_json(silent=True) or {}
+    settings = update_settings(data.get("enabled"), data.get("paths"), data.get("per_minute"))
+    return jsonify(settings), 200
+
+
+@admin_bp.route("/profiles", methods=["GET"])  # newest profiles first
+def profiles() -> tuple:
+    if not token_accepted():
+        return _token_required()
+    return jsonify(list_profiles()), 200
+
+
+@admin_bp.route("/profiles/<profile_id>", methods=["GET"])  # summary: top functions + SQL
+def profile_detail(profile_id: str) -> tuple:
+    if not token_accepted():
+        return _token_required()
+    meta = load_profile(profile_id)
+    if meta is None:
+        return jsonify({"error": "profile not found"}), 404
+    return jsonify(meta), 200
+
+
+@admin_bp.route("/profiles/<profile_id>/download", methods=["GET"])  # raw .pstats (snakeviz, pstats)
+def profile_download(profile_id: str) -> any:
+    if not token_accepted():
+        return _token_required()
+    path = profile_path(profile_id)
+    if path is None:
+        return jsonify({"error": "profile not found"}), 404
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}.pstats")
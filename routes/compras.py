@@ -4,19 +4,25 @@ from flask import request
 from flask import send_file
 
 from models.produto import (
-    list_orders,
+    iter_orders,
     list_order_items,
     consolidate_purchases,
-    create_logistics_plan_from_consolidation,
+    create_supplier_logistics_plans,
     seed_default_suppliers,
-    list_store_order_totals,
+    iter_store_order_totals,
     assign_supplier,
+    bulk_assign_suppliers,
     list_assignments,
-    consolidated_by_supplier,
+    iter_consolidated_by_supplier,
+    iter_consolidate_purchases,
+    demand_history,
+    reconciliation_report,
 )
 
-from utils.export_excel import export_store_excel
+from utils.export_excel import export_store_excel, export_reconciliation_excel
 from utils.export_word import export_consolidated_word
+from utils.demand_forecast import suggest_quantities
+from utils.streaming import stream_rows
 
 
 compras_bp = Blueprint("compras", __name__)
@@ -25,20 +31,20 @@ compras_bp = Blueprint("compras", __name__)
 @compras_bp.route("/pedidos", methods=["GET"])  # list orders with filters
 def pedidos() -> tuple:
     store = request.args.get("store")
-    rows = list_orders(store, None)
-    return jsonify(rows), 200
+    rows = iter_orders(store, None, request.args.get("archive") == "1")
+    return stream_rows(rows), 200
 
 
 @compras_bp.route("/pedido/<int:order_id>", methods=["GET"])  # order detail
 def pedido_detail(order_id: int) -> tuple:
-    rows = list_order_items(order_id)
+    rows = list_order_items(order_id, request.args.get("archive") == "1")
     return jsonify(rows), 200
 
 
 @compras_bp.route("/store/<string:store_code>/totais", methods=["GET"])  # totais por loja (todos os pedidos)
 def store_totais(store_code: str) -> tuple:
-    rows = list_store_order_totals(store_code)
-    return jsonify(rows), 200
+    rows = iter_store_order_totals(store_code, request.args.get("archive") == "1")
+    return stream_rows(rows), 200
 
 
 @compras_bp.route("/assign", methods=["POST"])  # define fornecedor para (loja, produto)
@@ -51,6 +57,22 @@ def set_assign() -> tuple:
     return jsonify({"ok": True}), 200
 
 
+@compras_bp.route("/assign/bulk", methods=["POST"])  # matriz loja x produto -> fornecedor, regras e cópia
+def set_assign_bulk() -> tuple:
+    data = request.get_json(force=True)
+    try:
+        diff = bulk_assign_suppliers(
+            data.get("assignments", []),
+            data.get("rules", []),
+            bool(data.get("copy_forward")),
+            bool(data.get("replace")),
+            bool(data.get("dry_run")),
+        )
+    except (ValueError, KeyError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(diff), 200
+
+
 @compras_bp.route("/store/<string:store_code>/assignments", methods=["GET"])  # ver atribuições por loja
 def get_assignments(store_code: str) -> tuple:
     rows = list_assignments(store_code)
@@ -59,28 +81,62 @@ def get_assignments(store_code: str) -> tuple:
 
 @compras_bp.route("/relatorio/consolidado-fornecedor", methods=["GET"])  # consolidado por fornecedor
 def rel_consolidado_fornecedor() -> tuple:
-    rows = consolidated_by_supplier()
-    return jsonify(rows), 200
+    rows = iter_consolidated_by_supplier(request.args.get("archive") == "1")
+    return stream_rows(rows), 200
 
 
 @compras_bp.route("/relatorio/consolidado", methods=["GET"])  # consolidated across stores
 def rel_consolidado() -> tuple:
-    rows = consolidate_purchases()
+    rows = iter_consolidate_purchases(request.args.get("archive") == "1")
+    return stream_rows(rows), 200
+
+
+@compras_bp.route("/relatorio/conciliacao", methods=["GET"])  # esperado x recebido x distribuído
+def rel_conciliacao() -> tuple:
+    rows = reconciliation_report(request.args.get("supplier"), request.args.get("archive") == "1")
+    return jsonify(rows), 200
+
+
+@compras_bp.route("/historico", methods=["GET"])  # demand history by day or week
+def historico() -> tuple:
+    try:
+        rows = demand_history(
+            request.args.get("store"),
+            request.args.get("product"),
+            request.args.get("granularity", "day"),
+            request.args.get("days", 56, type=int),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(rows), 200
+
+
+@compras_bp.route("/sugestao", methods=["GET"])  # suggested quantities per store
+def sugestao() -> tuple:
+    try:
+        rows = suggest_quantities(
+            request.args.get("date"),
+            request.args.get("days", 56, type=int),
+            request.args.get("window", 14, type=int),
+            request.args.get("horizon", 1, type=int),
+            request.args.get("store"),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     return jsonify(rows), 200
 
 
 @compras_bp.route("/enviar-logistica", methods=["POST"])  # finalize and send to logistics
 def enviar_logistica() -> tuple:
     data = request.get_json(force=True) if request.data else {}
-    supplier = data.get("supplier")
-    consolidated = consolidate_purchases()
-    create_logistics_plan_from_consolidation(consolidated, supplier)
-    return jsonify({"ok": True, "count": len(consolidated)}), 200
+    # one plan per product and assigned supplier; "supplier" only covers unassigned items
+    result = create_supplier_logistics_plans(data.get("supplier"))
+    return jsonify({"ok": True, **result}), 200
 
 
 @compras_bp.route("/export/excel", methods=["GET"])  # download consolidated Excel
 def export_excel() -> tuple:
-    consolidated = consolidate_purchases()
+    consolidated = consolidate_purchases(request.args.get("archive") == "1")
     rows = [
         {"code": r["code"], "name": r["name"], "quantity": r["total_quantity"], "unit": r["unit"]}
         for r in consolidated
@@ -98,7 +154,7 @@ def export_excel() -> tuple:
 
 @compras_bp.route("/export/word", methods=["GET"])  # download consolidated Word
 def export_word() -> tuple:
-    consolidated = consolidate_purchases()
+    consolidated = consolidate_purchases(request.args.get("archive") == "1")
     rows = [
         {"code": r["code"], "name": r["name"], "quantity": r["total_quantity"], "unit": r["unit"]}
         for r in consolidated
@@ -114,3 +170,17 @@ def export_word() -> tuple:
     )
 
 
+
+
+@compras_bp.route("/export/conciliacao/excel", methods=["GET"])  # download reconciliation Excel
+def export_conciliacao_excel() -> tuple:
+    items = reconciliation_report(request.args.get("supplier"), request.args.get("archive") == "1")
+    content = export_reconciliation_excel(items)
+    from io import BytesIO
+    bio = BytesIO(content)
+    return send_file(
+        bio,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        as_attachment=True,
+        download_name="conciliacao.xlsx",
+    )
@@ -4,11 +4,14 @@ from flask import request
 from flask import send_file
 
 from models.produto import (
-    list_logistics,
+    iter_logistics,
     update_received,
+    save_distribution,
     store_totals,
 )
 
+from utils.streaming import stream_rows
+
 
 logistica_bp = Blueprint("logistica", __name__)
 
@@ -17,8 +20,8 @@ logistica_bp = Blueprint("logistica", __name__)
 def itens() -> tuple:
     supplier = request.args.get("supplier")
     q = request.args.get("q")
-    rows = list_logistics(supplier, q)
-    return jsonify(rows), 200
+    rows = iter_logistics(supplier, q, request.args.get("archive") == "1")
+    return stream_rows(rows), 200
 
 
 @logistica_bp.route("/recebimento/<int:plan_id>", methods=["PUT"])  # update received qty
@@ -35,7 +38,7 @@ from utils.export_txt import export_store_txt
 
 @logistica_bp.route("/export/store/<string:store_code>/excel", methods=["GET"])  # per-store Excel
 def export_store_excel_route(store_code: str) -> tuple:
-    rows = store_totals(store_code)
+    rows = store_totals(store_code, request.args.get("archive") == "1")
     content = export_store_excel(rows, store_code)
     from io import BytesIO
     bio = BytesIO(content)
@@ -49,7 +52,7 @@ def export_store_excel_route(store_code: str) -> tuple:
 
 @logistica_bp.route("/export/store/<string:store_code>/txt", methods=["GET"])  # per-store TXT (VR MASTER)
 def export_store_txt_route(store_code: str) -> tuple:
-    rows = store_totals(store_code)
+    rows = store_totals(store_code, request.args.get("archive") == "1")
     content = export_store_txt(rows)
     from io import BytesIO
     bio = BytesIO(content)
@@ -61,70 +64,45 @@ def export_store_txt_route(store_code: str) -> tuple:
     )
 
 # New endpoints for supplier-focused logistics view
-from models.produto import get_connection
+from models.produto import list_logistics_suppliers, supplier_plan
 
 
 @logistica_bp.route("/fornecedores", methods=["GET"])  # list suppliers present in logistics_plan
 def fornecedores() -> tuple:
-    sql = (
-        "SELECT DISTINCT sp.name as supplier FROM logistics_plan lp LEFT JOIN suppliers sp ON sp.id = lp.supplier_id "
-        "WHERE lp.sent_to_logistics = 1 ORDER BY supplier"
-    )
-    with get_connection() as conn:
-        rows = conn.execute(sql).fetchall()
-        return jsonify([r["supplier"] for r in rows if r["supplier"]]), 200
+    return jsonify(list_logistics_suppliers()), 200
 
 
 @logistica_bp.route("/plano-fornecedor", methods=["GET"])  # items by supplier with per-store split
 def plano_fornecedor() -> tuple:
-    supplier = request.args.get("supplier")
-    search = request.args.get("q")
-    sql = (
-        "SELECT lp.id as plan_id, p.code, p.name, p.unit, sp.name as supplier, lp.expected_quantity, "
-        "COALESCE(lr.received_quantity, 0) as received_quantity "
-        "FROM logistics_plan lp JOIN products p ON p.id = lp.product_id "
-        "LEFT JOIN suppliers sp ON sp.id = lp.supplier_id "
-        "LEFT JOIN logistics_received lr ON lr.logistics_plan_id = lp.id WHERE lp.sent_to_logistics = 1"
-    )
-    params = []
-    if supplier:
-        sql += " AND sp.name = ?"
-        params.append(supplier)
-    if search:
-        sql += " AND (p.code LIKE ? OR p.name LIKE ?)"
-        like = f"%{search}%"
-        params.extend([like, like])
-    sql += " ORDER BY p.code"
-    with get_connection() as conn:
-        items = [dict(r) for r in conn.execute(sql, tuple(params)).fetchall()]
-        # attach distribution per store
-        for it in items:
-            dist_rows = conn.execute(
-                "SELECT s.code as store_code, s.name as store_name, ld.quantity FROM logistics_distribution ld JOIN stores s ON s.id = ld.store_id WHERE ld.logistics_plan_id = ?",
-                (it["plan_id"],)
-            ).fetchall()
-            it["distribution"] = [dict(r) for r in dist_rows]
-        return jsonify(items), 200
+    items = supplier_plan(request.args.get("supplier"), request.args.get("q"))
+    return jsonify(items), 200
 
 
 @logistica_bp.route("/distribuir/<int:plan_id>", methods=["POST"])  # save per-store distribution
 def distribuir(plan_id: int) -> tuple:
     data = request.get_json(force=True)
     distribution = data.get("distribution", [])  # [{store_code, quantity}]
-    with get_connection() as conn:
-        # resolve store ids and upsert
-        for d in distribution:
-            store_code = d.get("store_code")
-            qty = float(d.get("quantity", 0))
-            store = conn.execute("SELECT id FROM stores WHERE code = ?", (store_code,)).fetchone()
-            if not store:
-                continue
-            conn.execute(
-                "INSERT INTO logistics_distribution(logistics_plan_id, store_id, quantity) VALUES(?, ?, ?) "
-                "ON CONFLICT(logistics_plan_id, store_id) DO UPDATE SET quantity=excluded.quantity",
-                (plan_id, int(store["id"]), qty)
-            )
-        conn.commit()
+    save_distribution(plan_id, distribution)
     return jsonify({"ok": True}), 200
 
 
+from utils.allocation import allocate_received
+
+
+@logistica_bp.route("/distribuir-auto", methods=["POST"])  # automatic split of received qty (unsettled plans unless plan_ids/overwrite)
+def distribuir_auto() -> tuple:
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.get("dry_run")) or request.args.get("dry_run") == "1"
+    try:
+        result = allocate_received(
+            data.get("mode", "proportional"),
+            data.get("priority"),
+            data.get("plan_ids"),
+            dry_run,
+            bool(data.get("overwrite")),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(result), 200
+
+
@@ -3,13 +3,11 @@ from flask import jsonify
 from flask import request
 
 from models.produto import (
-    init_schema,
-    seed_default_stores,
-    seed_default_suppliers,
-    list_products,
+    initialize_database,
+    iter_products,
     create_order,
 )
-from utils.import_excel import import_products_from_excel
+from utils.streaming import stream_rows
 
 
 lojas_bp = Blueprint("lojas", __name__)
@@ -17,26 +15,17 @@ lojas_bp = Blueprint("lojas", __name__)
 
 @lojas_bp.route("/init", methods=["POST"])  # initialize DB if needed
 def init() -> tuple:
-    init_schema()
-    seed_default_stores()
-    seed_default_suppliers()
     # Optional Excel import if provided path
     data = request.get_json(silent=True) or {}
-    excel_path = data.get("excel_path")
-    imported = 0
-    if excel_path:
-        try:
-            imported = import_products_from_excel(excel_path)
-        except Exception:
-            imported = 0
+    imported = initialize_database(data.get("excel_path"))
     return jsonify({"ok": True, "imported": imported}), 200
 
 
 @lojas_bp.route("/produtos", methods=["GET"])  # list products with optional search
 def produtos() -> tuple:
     search = request.args.get("q")
-    rows = list_products(search)
-    return jsonify(rows), 200
+    rows = iter_products(search)
+    return stream_rows(rows), 200
 
 
 @lojas_bp.route("/pedido", methods=["POST"])  # create order
@@ -0,0 +1,206 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, make_server
+
+from app import create_app, start_background_services, stop_background_services
+from models.maintenance import run_maintenance_loop
+from models.produto import list_products, list_stores, consolidate_purchases
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # werkzeug server handling connections on a fixed pool of `threads` threads
+    # (its threaded mode starts one unbounded thread per connection)
+    multithread = True
+
+    def __init__(self, host: str, port: int, app: Flask, threads: int, fd: Optional[int] = None) -> None:
+        super().__init__(host, port, app, fd=fd)
+        self._pool: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="horti-http")
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        # wait for a free thread before taking the next connection, so excess connections
+        # stay in the shared listen backlog where another worker can accept them
+        self._slots.acquire()
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self) -> None:
+        # in-flight requests finish before the worker exits (the base constructor also
+        # calls this, before the pool exists, when it adopts an inherited fd)
+        pool = getattr(self, "_pool", None)
+        if pool is not None:
+            pool.shutdown(wait=True)
+            self._pool = None
+        super().server_close()
+
+
+def warm_up(app: Flask) -> None:
+    # Per-worker start: writer thread, warm page cache and Flask internals (the schema
+    # is checked once in the parent before forking)
+    start_background_services(maintenance=False)
+    list_stores()
+    list_products()
+    consolidate_purchases()
+    with app.test_client() as client:
+        client.get("/api/health")
+
+
+def _serve_worker(app: Flask, sock: socket.socket, threads: int) -> None:
+    warm_up(app)
+    host, port = sock.getsockname()[:2]
+    if threads > 1:
+        server: BaseWSGIServer = PooledWSGIServer(host, port, app, threads, fd=sock.fileno())
+    else:
+        server = make_server(host, port, app, fd=sock.fileno())
+
+    def stop(signum: int, frame: Any) -> None:
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        stop_background_services()
+
+
+def serve_builtin(app: Flask, host: str, port: int, workers: int, threads: int) -> None:
+    # Stdlib pre-fork server: one listening socket shared by `workers` forked werkzeug servers
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    if workers <= 1:
+        start_background_services(write_queue=False)
+        _serve_worker(app, sock, threads)
+        return
+
+    children: List[int] = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve_worker(app, sock, threads)
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    # the parent only supervises; maintenance runs here once instead of per worker
+    start_background_services(write_queue=False)
+
+    def forward(signum: int, frame: Any) -> None:
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for child in children:
+        os.waitpid(child, 0)
+    stop_background_services()
+
+
+def _start_maintenance_process() -> Optional[multiprocessing.process.BaseProcess]:
+    # Maintenance for the gunicorn master, which forks and re-forks workers: a thread there
+    # would be running (and possibly holding locks) at every fork, so it gets its own
+    # spawned process instead
+    interval = os.environ.get("HORTI_MAINTENANCE_INTERVAL")
+    if not interval:
+        return None
+    archive_days = os.environ.get("HORTI_ARCHIVE_DAYS")
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_maintenance_loop,
+        args=(float(interval), int(archive_days) if archive_days else None),
+        name="horti-maintenance",
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+def _stop_process(process: Optional[multiprocessing.process.BaseProcess]) -> None:
+    if process is not None and process.is_alive():
+        process.terminate()
+        process.join()
+
+
+def serve_gunicorn(app: Flask, host: str, port: int, workers: int, threads: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    maintenance: Dict[str, Any] = {}
+
+    class HortiApplication(BaseApplication):
+        def __init__(self, options: Dict[str, Any]) -> None:
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self) -> Flask:
+            return app
+
+    HortiApplication({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": True,
+        "graceful_timeout": 30,
+        "when_ready": lambda server: maintenance.update(process=_start_maintenance_process()),
+        "post_worker_init": lambda worker: warm_up(app),
+        "worker_exit": lambda server, worker: stop_background_services(),
+        "on_exit": lambda server: _stop_process(maintenance.get("process")),
+    }).run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the Horti API with multiple workers")
+    parser.add_argument("--host", default=os.environ.get("HORTI_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("HORTI_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("HORTI_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("HORTI_THREADS", "8")))
+    parser.add_argument("--server", choices=("auto", "gunicorn", "builtin"), default="auto")
+    args = parser.parse_args()
+
+    # preloaded once in the parent (schema migrated there); background threads are
+    # started per process
+    app = create_app(start_services=False)
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "builtin"
+    if server == "gunicorn":
+        serve_gunicorn(app, args.host, args.port, args.workers, args.threads)
+    else:
+        serve_builtin(app, args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from models.produto import list_stores, allocation_inputs, save_distributions
+
+
+# Smallest quantity handed to a store, per product unit
+ROUNDING_STEP = {"KG": 0.01, "UN": 1.0}
+
+
+def _round_preserving_total(raw: np.ndarray, total: np.ndarray, step: np.ndarray) -> np.ndarray:
+    # Largest-remainder rounding: floor every share to the unit step, then hand the
+    # leftover steps to the stores with the biggest fractional parts.
+    units = raw / step[:, None]
+    base = np.floor(units + 1e-9)
+    target = np.floor(total / step + 1e-9)
+    extra = np.clip(target - base.sum(axis=1), 0, None)
+    order = np.argsort(-(units - base), axis=1, kind="stable")
+    ranks = np.argsort(order, axis=1, kind="stable")
+    base += ranks < extra[:, None]
+    return np.round(base * step[:, None], 6)
+
+
+def _proportional(demand: np.ndarray, received: np.ndarray) -> np.ndarray:
+    totals = demand.sum(axis=1, keepdims=True)
+    share = np.divide(demand, totals, out=np.zeros_like(demand), where=totals > 0)
+    return share * received[:, None]
+
+
+def _priority(demand: np.ndarray, received: np.ndarray, order: np.ndarray) -> np.ndarray:
+    # Fill each store's ordered quantity in priority order; any surplus is split proportionally
+    ordered = demand[:, order]
+    before = np.cumsum(ordered, axis=1) - ordered
+    filled = np.clip(received[:, None] - before, 0, ordered)
+    alloc = np.empty_like(demand)
+    alloc[:, order] = filled
+    surplus = np.clip(received - demand.sum(axis=1), 0, None)
+    return alloc + _proportional(demand, surplus)
+
+
+def allocate_received(
+    mode: str = "proportional",
+    priority: Optional[List[str]] = None,
+    plan_ids: Optional[List[int]] = None,
+    dry_run: bool = False,
+    overwrite: bool = False,
+) -> Dict[str, Any]:
+    if mode not in ("proportional", "priority"):
+        raise ValueError("mode must be 'proportional' or 'priority'")
+
+    stores = list_stores()
+    plans, totals = allocation_inputs(plan_ids, overwrite)
+    store_idx = {s["id"]: i for i, s in enumerate(stores)}
+    plan_idx = {p["plan_id"]: i for i, p in enumerate(plans)}
+
+    # demand per (plan, store): what each of the plan's stores ordered of its product
+    demand = np.zeros((len(plans), len(stores)))
+    for row in totals:
+        if row["plan_id"] in plan_idx and row["store_id"] in store_idx:
+            demand[plan_idx[row["plan_id"]], store_idx[row["store_id"]]] += row["quantity"]
+    received = np.array([float(p["received_quantity"]) for p in plans])
+    step = np.array([ROUNDING_STEP.get(p["unit"], 1.0) for p in plans])
+
+    if mode == "proportional":
+        raw = _proportional(demand, received)
+    else:
+        codes = [s["code"] for s in stores]
+        ranked = [codes.index(c) for c in (priority or []) if c in codes]
+        order = np.array(ranked + [i for i in range(len(stores)) if i not in ranked], dtype=int)
+        raw = _priority(demand, received, order)
+    has_demand = demand.sum(axis=1) > 0
+    alloc = _round_preserving_total(raw, np.where(has_demand, received, 0), step)
+
+    proposals: List[Dict[str, Any]] = []
+    skipped: List[int] = []
+    writes = []
+    for i, plan in enumerate(plans):
+        if not has_demand[i]:
+            skipped.append(plan["plan_id"])
+            continue
+        distribution = []
+        for j in np.flatnonzero(demand[i] > 0):
+            qty = float(alloc[i, j])
+            distribution.append({"store_code": stores[j]["code"], "ordered": float(demand[i, j]), "quantity": qty})
+            writes.append((plan["plan_id"], stores[j]["id"], qty))
+        proposals.append({
+            "plan_id": plan["plan_id"],
+            "code": plan["code"],
+            "unit": plan["unit"],
+            "received_quantity": plan["received_quantity"],
+            "distribution": distribution,
+        })
+
+    if not dry_run and writes:
+        save_distributions(writes)
+    return {"mode": mode, "dry_run": dry_run, "plans": proposals, "skipped": skipped}
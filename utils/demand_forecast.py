@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from models.produto import list_stores, list_products, demand_window
+
+
+def suggest_quantities(
+    target_day: Optional[str] = None,
+    days: int = 56,
+    window: int = 14,
+    horizon: int = 1,
+    store_code: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    # Suggested order per store: moving average of the last `window` days scaled by the
+    # weekday seasonality of the target day, over a dense (store, product, day) array.
+    # a full week of history is needed for every weekday to have at least one column
+    if days < 7:
+        raise ValueError("days must be at least 7")
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    target = date.fromisoformat(target_day) if target_day else date.today() + timedelta(days=1)
+    end = target - timedelta(days=1)
+    window = min(window, days)
+
+    stores = list_stores()
+    products = list_products()
+    store_idx = {s["id"]: i for i, s in enumerate(stores)}
+    product_idx = {p["id"]: i for i, p in enumerate(products)}
+
+    history = np.zeros((len(stores), len(products), days))
+    rows = demand_window(end.isoformat(), days)
+    if rows:
+        data = np.array([tuple(r) for r in rows], dtype=float)
+        keep = np.isin(data[:, 0], list(store_idx)) & np.isin(data[:, 1], list(product_idx))
+        data = data[keep]
+        s = np.array([store_idx[int(v)] for v in data[:, 0]], dtype=int)
+        p = np.array([product_idx[int(v)] for v in data[:, 1]], dtype=int)
+        d = days - 1 - data[:, 2].astype(int)
+        np.add.at(history, (s, p, d), data[:, 3])
+
+    # weekday of every column; last column is `end`
+    weekdays = (np.arange(days) - (days - 1) + end.weekday()) % 7
+    overall = history.mean(axis=2)
+    same_weekday = history[:, :, weekdays == target.weekday()].mean(axis=2)
+    factor = np.divide(same_weekday, overall, out=np.ones_like(overall), where=overall > 0)
+    moving_average = history[:, :, -window:].mean(axis=2)
+    suggested = moving_average * factor * horizon
+
+    is_unit = np.array([p["unit"] == "UN" for p in products])
+    suggested = np.where(is_unit, np.ceil(suggested), np.round(suggested, 2))
+
+    result: List[Dict[str, Any]] = []
+    for i, store in enumerate(stores):
+        if store_code and store["code"] != store_code:
+            continue
+        items = [
+            {
+                "code": products[j]["code"],
+                "name": products[j]["name"],
+                "unit": products[j]["unit"],
+                "suggested_quantity": float(suggested[i, j]),
+                "moving_average": round(float(moving_average[i, j]), 3),
+                "weekday_factor": round(float(factor[i, j]), 3),
+            }
+            for j in np.flatnonzero(suggested[i] > 0)
+        ]
+        result.append({"store_code": store["code"], "store_name": store["name"], "items": items})
+    return result
@@ -3,12 +3,7 @@ from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
 
 
-def export_store_excel(rows: List[Dict[str, Any]], store_name: str) -> bytes:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = store_name[:31]
-
-    headers = ["CODIGO DO PRODUTO", "NOME DO PRODUTO", "QUANTIDADE", "UNIDADE"]
+def _write_sheet(ws: Any, headers: List[str], values: List[List[Any]]) -> None:
     ws.append(headers)
 
     bold = Font(bold=True, color="FFFFFF")
@@ -23,13 +18,8 @@ def export_store_excel(rows: List[Dict[str, Any]], store_name: str) -> bytes:
         cell.alignment = Alignment(horizontal="center")
         cell.border = border
 
-    for row in rows:
-        ws.append([
-            row.get("code"),
-            row.get("name"),
-            row.get("quantity"),
-            row.get("unit"),
-        ])
+    for row in values:
+        ws.append(row)
 
     for column_cells in ws.columns:
         max_length = 12
@@ -40,13 +30,63 @@ def export_store_excel(rows: List[Dict[str, Any]], store_name: str) -> bytes:
                 pass
         ws.column_dimensions[column_cells[0].column_letter].width = min(max_length + 2, 50)
 
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=4):
+    for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=len(headers)):
         for cell in row:
             cell.border = border
 
+
+def _to_bytes(wb: Workbook) -> bytes:
     from io import BytesIO
     bio = BytesIO()
     wb.save(bio)
     return bio.getvalue()
 
 
+def export_store_excel(rows: List[Dict[str, Any]], store_name: str) -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = store_name[:31]
+
+    headers = ["CODIGO DO PRODUTO", "NOME DO PRODUTO", "QUANTIDADE", "UNIDADE"]
+    _write_sheet(ws, headers, [
+        [row.get("code"), row.get("name"), row.get("quantity"), row.get("unit")]
+        for row in rows
+    ])
+    return _to_bytes(wb)
+
+
+def export_reconciliation_excel(items: List[Dict[str, Any]]) -> bytes:
+    # One line per supplier/product/store; plan totals repeat on each store line. Plans
+    # without any store line still get one line, with the store columns left blank.
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Conciliacao"
+
+    headers = [
+        "FORNECEDOR", "CODIGO", "PRODUTO", "UNIDADE", "ESPERADO", "RECEBIDO", "DISTRIBUIDO",
+        "NAO DISTRIBUIDO", "ALERTAS", "LOJA", "PEDIDO LOJA", "DISTRIBUIDO LOJA", "ALERTAS LOJA",
+    ]
+    values = []
+    for item in items:
+        plan = [
+            item.get("supplier") or "",
+            item["code"],
+            item["name"],
+            item["unit"],
+            item["expected_quantity"],
+            item["received_quantity"],
+            item["distributed_quantity"],
+            item["undistributed_quantity"],
+            ", ".join(item["flags"]),
+        ]
+        if not item["stores"]:
+            values.append(plan + ["", "", "", ""])
+        for store in item["stores"]:
+            values.append(plan + [
+                store["store_code"],
+                store["ordered"],
+                store["distributed"],
+                ", ".join(store["flags"]),
+            ])
+    _write_sheet(ws, headers, values)
+    return _to_bytes(wb)
@@ -0,0 +1,267 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from models import produto
+from models.produto import DEFAULT_STORES, init_schema, list_products, seed_default_stores, seed_default_suppliers
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.locked: Dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, seconds: float, ok: bool, locked: bool) -> None:
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+            if locked:
+                self.locked[endpoint] += 1
+
+    def report(self, elapsed: float) -> List[Dict[str, Any]]:
+        rows = []
+        for endpoint in sorted(self.samples):
+            latencies = sorted(self.samples[endpoint])
+            count = len(latencies)
+
+            def pct(q: float) -> float:
+                return round(latencies[min(count - 1, int(q * count))] * 1000, 2)
+
+            rows.append({
+                "endpoint": endpoint,
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 1),
+                "p50_ms": pct(0.50),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / count, 4),
+                "database_locked": self.locked[endpoint],
+            })
+        return rows
+
+
+def _call(base: str, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+    except (OSError, http.client.HTTPException) as exc:
+        # includes IncompleteRead from a streamed body cut short by a server-side error
+        return 0, str(exc).encode("utf-8")
+
+
+def _fire(rec: Recorder, base: str, scheduled: float, label: str, method: str, path: str, body: Optional[Dict[str, Any]]) -> None:
+    status, payload = _call(base, method, path, body)
+    # latency counts from the scheduled send time, so time spent waiting behind a
+    # saturated server (or a busy sender pool) is included rather than omitted
+    rec.add(label, time.monotonic() - scheduled, 200 <= status < 300, b"database is locked" in payload)
+
+
+def _actor(
+    rec: Recorder,
+    pool: ThreadPoolExecutor,
+    base: str,
+    rate: float,
+    deadline: float,
+    step: Callable[[random.Random], Tuple[str, str, str, Optional[Dict[str, Any]]]],
+    seed: int,
+) -> None:
+    # Open-loop client: schedules requests at `rate` requests/s with exponential gaps until
+    # the deadline and hands each one to the sender pool, never waiting for responses
+    rnd = random.Random(seed)
+    next_at = time.monotonic()
+    while True:
+        next_at += rnd.expovariate(rate)
+        now = time.monotonic()
+        if next_at >= deadline:
+            return
+        if next_at > now:
+            time.sleep(next_at - now)
+        pool.submit(_fire, rec, base, next_at, *step(rnd))
+
+
+def _prepare_database(db_path: Optional[str]) -> str:
+    # Work on a copy so load tests never touch the real horti.db
+    workdir = tempfile.mkdtemp(prefix="horti-load-")
+    target = os.path.join(workdir, "horti.db")
+    if db_path and os.path.exists(db_path):
+        shutil.copyfile(db_path, target)
+    produto.DB_PATH = target
+    produto.ARCHIVE_PATH = os.path.join(workdir, "horti_archive.db")
+    init_schema()
+    seed_default_stores()
+    seed_default_suppliers()
+    if not list_products():
+        from utils.seed_products import ITEMS, normalize_unit
+
+        for code, name, unit in ITEMS:
+            produto.upsert_product(code.strip(), name.strip(), normalize_unit(unit))
+    return workdir
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+def _start_server(write_queue: bool) -> Tuple[Any, str]:
+    if write_queue:
+        os.environ["HORTI_WRITE_QUEUE"] = "1"
+    from app import create_app
+
+    app = create_app()
+
+    @app.errorhandler(sqlite3.OperationalError)
+    def sqlite_error(exc: sqlite3.OperationalError) -> tuple:
+        return {"error": str(exc)}, 503
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name="horti-load-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_load_test(
+    duration: float = 30.0,
+    clients_per_store: int = 2,
+    order_rate: float = 2.0,
+    purchasing_clients: int = 2,
+    report_rate: float = 1.0,
+    logistics_clients: int = 4,
+    logistics_rate: float = 2.0,
+    items_per_order: int = 15,
+    db_path: Optional[str] = None,
+    write_queue: bool = False,
+    max_inflight: int = 256,
+) -> Dict[str, Any]:
+    saved = (produto.DB_PATH, produto.ARCHIVE_PATH, os.environ.get("HORTI_WRITE_QUEUE"))
+    workdir = _prepare_database(db_path)
+    server, base = _start_server(write_queue)
+    try:
+        codes = [p["code"] for p in list_products()]
+        stores = [code for code, _ in DEFAULT_STORES]
+
+        # one round of orders and a logistics plan so receiving/distribution have targets
+        for store in stores:
+            _call(base, "POST", "/api/lojas/pedido", {
+                "store_code": store,
+                "items": [{"code": c, "quantity": 1} for c in codes[:items_per_order]],
+            })
+        _call(base, "POST", "/api/compras/enviar-logistica", {})
+        plan_ids = [row["plan_id"] for row in json.loads(_call(base, "GET", "/api/logistica/itens")[1])]
+
+        def order_step(store: str) -> Callable[[random.Random], Tuple[str, str, str, Optional[Dict[str, Any]]]]:
+            def step(rnd: random.Random) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+                items = [{"code": c, "quantity": rnd.randint(1, 20)} for c in rnd.sample(codes, min(items_per_order, len(codes)))]
+                return "POST /api/lojas/pedido", "POST", "/api/lojas/pedido", {"store_code": store, "items": items}
+            return step
+
+        def report_step(rnd: random.Random) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+            if rnd.random() < 0.5:
+                return "GET /api/compras/relatorio/consolidado", "GET", "/api/compras/relatorio/consolidado", None
+            return "GET /api/compras/relatorio/consolidado-fornecedor", "GET", "/api/compras/relatorio/consolidado-fornecedor", None
+
+        def logistics_step(rnd: random.Random) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+            plan_id = rnd.choice(plan_ids)
+            if rnd.random() < 0.5:
+                return ("PUT /api/logistica/recebimento/<id>", "PUT", f"/api/logistica/recebimento/{plan_id}",
+                        {"received_quantity": rnd.randint(1, 100)})
+            distribution = [{"store_code": s, "quantity": rnd.randint(0, 20)} for s in stores]
+            return ("POST /api/logistica/distribuir/<id>", "POST", f"/api/logistica/distribuir/{plan_id}",
+                    {"distribution": distribution})
+
+        actors: List[Tuple[float, Callable[..., Any]]] = []
+        for store in stores:
+            actors += [(order_rate, order_step(store))] * clients_per_store
+        actors += [(report_rate, report_step)] * purchasing_clients
+        if plan_ids:
+            actors += [(logistics_rate, logistics_step)] * logistics_clients
+
+        rec = Recorder()
+        pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="horti-load-send")
+        start = time.monotonic()
+        deadline = start + duration
+        threads = [
+            threading.Thread(target=_actor, args=(rec, pool, base, rate, deadline, step, i), daemon=True)
+            for i, (rate, step) in enumerate(actors)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # requests still in flight at the deadline are waited for and recorded
+        pool.shutdown(wait=True)
+        elapsed = time.monotonic() - start
+        return {"duration_s": round(elapsed, 2), "clients": len(threads), "endpoints": rec.report(elapsed)}
+    finally:
+        server.shutdown()
+        # leave the process as it was: no writer thread, env var or paths pointing at the copy
+        from app import stop_background_services
+
+        stop_background_services()
+        produto.DB_PATH, produto.ARCHIVE_PATH = saved[0], saved[1]
+        if saved[2] is None:
+            os.environ.pop("HORTI_WRITE_QUEUE", None)
+        else:
+            os.environ["HORTI_WRITE_QUEUE"] = saved[2]
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Mixed-workload load test against a local create_app()")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--clients-per-store", type=int, default=2)
+    parser.add_argument("--order-rate", type=float, default=2.0, help="orders/s per store client")
+    parser.add_argument("--purchasing-clients", type=int, default=2)
+    parser.add_argument("--report-rate", type=float, default=1.0, help="report requests/s per purchasing client")
+    parser.add_argument("--logistics-clients", type=int, default=4)
+    parser.add_argument("--logistics-rate", type=float, default=2.0, help="requests/s per logistics client")
+    parser.add_argument("--items-per-order", type=int, default=15)
+    parser.add_argument("--db", default=produto.DB_PATH, help="database copied as the starting state")
+    parser.add_argument("--write-queue", action="store_true", help="run with HORTI_WRITE_QUEUE=1")
+    parser.add_argument("--max-inflight", type=int, default=256, help="concurrent requests the sender pool can hold")
+    args = parser.parse_args()
+    return run_load_test(
+        args.duration,
+        args.clients_per_store,
+        args.order_rate,
+        args.purchasing_clients,
+        args.report_rate,
+        args.logistics_clients,
+        args.logistics_rate,
+        args.items_per_order,
+        args.db,
+        args.write_queue,
+        args.max_inflight,
+    )
+
+
+if __name__ == "__main__":
+    result = main()
+    print(f"{result['clients']} clients, {result['duration_s']} s")
+    print(f"{'endpoint':52} {'req':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6} {'locked':>6}")
+    for row in result["endpoints"]:
+        print(
+            f"{row['endpoint']:52} {row['requests']:>6} {row['throughput_rps']:>7} {row['p50_ms']:>8} "
+            f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['error_rate'] * 100:>6.2f} {row['database_locked']:>6}"
+        )
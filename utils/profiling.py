@@ -0,0 +1,216 @@
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from flask import Flask
+from flask import g
+from flask import request
+
+from models import produto
+from models.produto import SQL_TRACE
+
+
+# Opt-in request profiling: a request is run under cProfile (with its SQL statements
+# recorded, literals redacted) when it matches a path prefix enabled through the admin
+# toggle, at most HORTI_PROFILE_PER_MINUTE times per minute. "X-Profile: 1" selects a
+# single request only while the toggle is on; when HORTI_PROFILE_TOKEN is set, a request
+# sending "X-Profile: <token>" is profiled even with the toggle off, and the token is
+# then also required by the /api/admin profiling endpoints.
+
+_lock = threading.Lock()
+_settings: Dict[str, Any] = {
+    "enabled": False,
+    "paths": [],
+    "per_minute": int(os.environ.get("HORTI_PROFILE_PER_MINUTE", "5")),
+    "keep": int(os.environ.get("HORTI_PROFILE_KEEP", "50")),
+}
+_recent: Deque[float] = deque()
+
+# string and numeric literals in traced SQL (bound values are expanded by sqlite)
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def profile_dir() -> str:
+    return os.path.join(os.path.dirname(produto.DB_PATH), "profiles")
+
+
+def get_settings() -> Dict[str, Any]:
+    with _lock:
+        return dict(_settings, paths=list(_settings["paths"]))
+
+
+def update_settings(enabled: Optional[bool] = None, paths: Optional[List[str]] = None, per_minute: Optional[int] = None) -> Dict[str, Any]:
+    with _lock:
+        if enabled is not None:
+            _settings["enabled"] = bool(enabled)
+        if paths is not None:
+            _settings["paths"] = [str(p) for p in paths]
+        if per_minute is not None:
+            _settings["per_minute"] = max(0, int(per_minute))
+    return get_settings()
+
+
+def _take_sample() -> bool:
+    now = time.monotonic()
+    with _lock:
+        while _recent and now - _recent[0] > 60:
+            _recent.popleft()
+        if len(_recent) >= _settings["per_minute"]:
+            return False
+        _recent.append(now)
+        return True
+
+
+def _has_token() -> bool:
+    header = request.headers.get("X-Profile")
+    token = os.environ.get("HORTI_PROFILE_TOKEN")
+    return bool(token and header and hmac.compare_digest(header, token))
+
+
+def token_accepted() -> bool:
+    # Gate for the profiling admin endpoints: open when no HORTI_PROFILE_TOKEN is set,
+    # otherwise the request must send "X-Profile: <token>"
+    return not os.environ.get("HORTI_PROFILE_TOKEN") or _has_token()
+
+
+def _wanted() -> bool:
+    if _has_token():
+        return True
+    header = request.headers.get("X-Profile")
+    with _lock:
+        if not _settings["enabled"]:
+            return False
+        paths = _settings["paths"]
+    if header == "1":
+        return True
+    return not paths or any(request.path.startswith(p) for p in paths)
+
+
+def _top_functions(stats: pstats.Stats, limit: int = 25) -> List[Dict[str, Any]]:
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:limit]  # type: ignore[attr-defined]
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": nc,
+            "total_time_ms": round(tt * 1000, 3),
+            "cumulative_time_ms": round(ct * 1000, 3),
+        }
+        for (filename, line, name), (_, nc, tt, ct, _) in rows
+    ]
+
+
+def _save(profile_id: str, profiler: cProfile.Profile, statements: List[str], meta: Dict[str, Any]) -> None:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.pstats"))
+    meta["top_functions"] = _top_functions(pstats.Stats(profiler))
+    meta["sql_count"] = len(statements)
+    # order quantities, store codes etc. must not end up in downloadable files
+    meta["sql"] = [_SQL_LITERAL.sub("?", statement) for statement in statements]
+    with open(os.path.join(directory, f"{profile_id}.json"), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+
+    # keep only the newest profiles
+    metas = sorted(
+        (name for name in os.listdir(directory) if name.endswith(".json")),
+        key=lambda name: os.path.getmtime(os.path.join(directory, name)),
+        reverse=True,
+    )
+    for name in metas[_settings["keep"]:]:
+        for ext in (".json", ".pstats"):
+            try:
+                os.remove(os.path.join(directory, name[:-len(".json")] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    items = []
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            meta = load_profile(name[:-len(".json")])
+            if meta:
+                items.append({k: meta[k] for k in ("id", "method", "path", "status", "duration_ms", "sql_count", "created_at")})
+    return sorted(items, key=lambda m: m["created_at"], reverse=True)
+
+
+def load_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    path = profile_path(profile_id, ".json")
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def profile_path(profile_id: str, ext: str = ".pstats") -> Optional[str]:
+    # ids are generated hex strings; anything else never maps to a file
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(profile_dir(), f"{profile_id}{ext}")
+    return path if os.path.exists(path) else None
+
+
+def init_profiling(app: Flask) -> None:
+    @app.before_request
+    def _start_profile() -> None:
+        if not _wanted() or not _take_sample():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active on this thread
+            return
+        statements: List[str] = []
+        SQL_TRACE.set(statements)
+        g.horti_profile = {
+            "id": uuid.uuid4().hex,
+            "profiler": profiler,
+            "statements": statements,
+            "method": request.method,
+            # path only: query values (store, supplier, search) stay out of the files
+            "path": request.path,
+            "started": time.perf_counter(),
+        }
+
+    @app.after_request
+    def _tag_response(response: Any) -> Any:
+        state = g.pop("horti_profile", None)
+        if state is not None:
+            response.headers["X-Profile-Id"] = state["id"]
+            # streamed bodies are generated after the request context is gone, so the
+            # profile is closed when the server closes the response
+            response.call_on_close(lambda: _finish(state, response.status_code, None))
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc: Optional[BaseException]) -> None:
+        # only reached with a pending profile when no response was produced
+        state = g.pop("horti_profile", None)
+        if state is not None:
+            _finish(state, 500, exc)
+
+
+def _finish(state: Dict[str, Any], status: int, exc: Optional[BaseException]) -> None:
+    state["profiler"].disable()
+    SQL_TRACE.set(None)
+    _save(state["id"], state["profiler"], state["statements"], {
+        "id": state["id"],
+        "method": state["method"],
+        "path": state["path"],
+        "status": status,
+        "duration_ms": round((time.perf_counter() - state["started"]) * 1000, 3),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "error": repr(exc) if exc else None,
+    })
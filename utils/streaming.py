@@ -0,0 +1,61 @@
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+from flask import Response
+from flask import current_app
+from flask import request
+from flask import stream_with_context
+
+
+def encode_rows(
+    rows: Iterable[Dict[str, Any]],
+    ndjson: bool,
+    dumps: Callable[[Any], str],
+    batch: int = 100,
+) -> Iterator[str]:
+    pending = []
+    first = True
+    if not ndjson:
+        yield "["
+    for row in rows:
+        if ndjson:
+            pending.append(dumps(row) + "\n")
+        else:
+            pending.append(dumps(row) if first else "," + dumps(row))
+            first = False
+        if len(pending) >= batch:
+            yield "".join(pending)
+            pending = []
+    if pending:
+        yield "".join(pending)
+    if not ndjson:
+        yield "]"
+
+
+def _resume(first: Dict[str, Any], rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    try:
+        yield first
+        yield from rows
+    finally:
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
+
+
+def prime_rows(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # Run the query and read its first chunk now: a failure (missing table, database is
+    # locked) then raises before the status line is sent instead of truncating a 200 body
+    it = iter(rows)
+    try:
+        first = next(it)
+    except StopIteration:
+        return iter(())
+    return _resume(first, it)
+
+
+def stream_rows(rows: Iterable[Dict[str, Any]]) -> Response:
+    # Stream a JSON array (or NDJSON when the client sends Accept: application/x-ndjson)
+    # straight from a row iterator, so memory stays flat regardless of result size
+    ndjson = "application/x-ndjson" in request.headers.get("Accept", "")
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    rows = prime_rows(rows)
+    return Response(stream_with_context(encode_rows(rows, ndjson, current_app.json.dumps)), mimetype=mimetype)